@@ -0,0 +1,133 @@
+"""
+Бенчмарк парсера и обработчика навыка на записанных страницах расписания, без обращения к ssau.ru.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench                  # замер и сравнение с baseline.json
+    python -m benchmarks.bench --check          # код возврата 1, если p50 хуже baseline больше чем на 20%
+    python -m benchmarks.bench --save-baseline  # сохранить результаты как новый baseline
+"""
+import argparse
+import copy
+import datetime
+import sys
+from itertools import cycle
+
+from bs4 import BeautifulSoup
+
+import index
+import lxml_parser
+import run
+import serialization
+from benchmarks.common import Result, load_baseline, load_html_fixtures, measure, report, save_baseline
+from benchmarks.stub_server import start_stub_server
+from cache import MemoryCache
+from parser import SSAUParser
+from to_ics import generate_ics_from_week
+
+PHRASES = [
+    'расписание на сегодня',
+    'что у меня завтра',
+    'какие пары послезавтра',
+    'расписание на следующий понедельник',
+    'что было в среду',
+    'расписание на 20 число',
+    'какие пары 15 марта',
+    'через 3 дня',
+    '2 недели назад',
+    'через 2 месяца',
+]
+
+HANDLER_PHRASES = [
+    'расписание на следующий понедельник',
+    'расписание на следующий вторник',
+    'расписание на следующий четверг',
+]
+
+
+def bench_create_week(pages: list[str], min_time: float) -> list[Result]:
+    pages_iter = cycle(pages)
+    return [
+        measure('SSAUParser._create_week[bs4]',
+                lambda: SSAUParser._create_week(BeautifulSoup(next(pages_iter), 'lxml'), 1), min_time),
+        measure('lxml_parser.create_week',
+                lambda: lxml_parser.create_week(next(pages_iter), 1), min_time),
+    ]
+
+
+def bench_generate_ics(pages: list[str], min_time: float) -> list[Result]:
+    weeks_iter = cycle([lxml_parser.create_week(page, 1) for page in pages])
+    return [measure('generate_ics_from_week', lambda: generate_ics_from_week([next(weeks_iter)]), min_time)]
+
+
+def bench_serialization(pages: list[str], min_time: float) -> list[Result]:
+    weeks_iter = cycle([lxml_parser.create_week(page, 1).freeze() for page in pages])
+    dumps_iter = cycle([serialization.dumps(lxml_parser.create_week(page, 1)) for page in pages])
+    return [
+        measure('serialization.dumps', lambda: serialization.dumps(next(weeks_iter)), min_time),
+        measure('serialization.loads', lambda: serialization.loads(next(dumps_iter)), min_time),
+    ]
+
+
+def bench_parse_date(min_time: float) -> list[Result]:
+    phrases_iter = cycle(PHRASES)
+    return [measure('parse_date_from_phrase', lambda: index.parse_date_from_phrase(next(phrases_iter)), min_time)]
+
+
+def bench_handler(group_ids: list[int], min_time: float) -> list[Result]:
+    server, SSAUParser._URL = start_stub_server()
+    events = []
+    for group_id in group_ids:
+        for phrase in HANDLER_PHRASES:
+            event = copy.deepcopy(run.request)
+            event['session']['new'] = False
+            event['request']['original_utterance'] = phrase
+            event['state']['user']['group_id'] = group_id
+            events.append(event)
+    events_iter = cycle(events)
+
+    def cold():
+        SSAUParser.cache.clear()
+        index.handler(next(events_iter), None)
+
+    try:
+        return [
+            measure('index.handler[cold cache]', cold, min_time),
+            measure('index.handler[warm cache]', lambda: index.handler(next(events_iter), None), min_time),
+        ]
+    finally:
+        server.shutdown()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--min-time', type=float, default=1.0, help='минимальное время замера, секунд')
+    arg_parser.add_argument('--check', action='store_true', help='завершиться с ошибкой при регрессии')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, help='допустимое ухудшение p50')
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    args = arg_parser.parse_args()
+
+    fixtures = load_html_fixtures()
+    pages = list(fixtures.values())
+    group_ids = sorted({group_id for group_id, _ in fixtures})
+
+    SSAUParser.cache = MemoryCache()
+    print(f'{len(pages)} страниц, {len(group_ids)} групп, {datetime.date.today()}')
+
+    results = [
+        *bench_create_week(pages, args.min_time),
+        *bench_generate_ics(pages, args.min_time),
+        *bench_serialization(pages, args.min_time),
+        *bench_parse_date(args.min_time),
+        *bench_handler(group_ids, args.min_time),
+    ]
+    regressions = report(results, load_baseline(), args.tolerance)
+
+    if args.save_baseline:
+        save_baseline(results)
+    if args.check and regressions:
+        print(f"Регрессия: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Задержка SSAUParser.get_day на записанных страницах, когда страница уже загружена, но ещё не разобрана:
+разбор всей недели (как раньше) против ленивой недели, в которой разбирается только столбец нужного дня.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_get_day
+    python -m benchmarks.bench_get_day --save-baseline
+"""
+import argparse
+import time
+from itertools import cycle
+
+from benchmarks.common import load_baseline, load_html_fixtures, measure, report, save_baseline
+from cache import CacheEntry, MemoryCache
+from parser import SSAUParser
+
+
+def bench_backend(backend: str, fixtures: dict[tuple[int, int], str], min_time: float) -> list:
+    SSAUParser.backend = backend
+    # (группа, дата, HTML страницы) для каждого учебного дня записанных страниц
+    days = [(group_id, day.date, html)
+            for (group_id, number_week), html in fixtures.items()
+            for day in SSAUParser._parse_week(html, number_week).days]
+    days_iter = cycle(days)
+
+    def full_week():
+        group_id, date, html = next(days_iter)
+        week = SSAUParser._parse_week(html, SSAUParser.get_number_week(date)).freeze()
+        return week.days[date.weekday()]
+
+    def lazy_week():
+        group_id, date, html = next(days_iter)
+        # Страница в кэше без разобранной недели: get_day разбирает её сам
+        key = SSAUParser._cache_key(group_id, SSAUParser.get_number_week(date))
+        SSAUParser.cache.set(key, CacheEntry(html, expires_at=time.time() + 60))
+        return SSAUParser.get_day(group_id, date)
+
+    return [
+        measure(f'get_day[{backend}, full week]', full_week, min_time),
+        measure(f'get_day[{backend}, lazy]', lazy_week, min_time),
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--min-time', type=float, default=1.0, help='минимальное время замера, секунд')
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    args = arg_parser.parse_args()
+
+    fixtures = load_html_fixtures()
+    SSAUParser.cache = MemoryCache()
+    # Календари семестров групп известны, как после первого запроса: замеряется только разбор страницы
+    for (group_id, _), html in fixtures.items():
+        SSAUParser._remember_calendar(group_id, CacheEntry(html, expires_at=time.time() + SSAUParser.CACHE_TTL,
+                                                           semester_start=SSAUParser._parse_start_semester(html)))
+    print(f'{len(fixtures)} страниц')
+
+    results = [*bench_backend('bs4', fixtures, args.min_time), *bench_backend('lxml', fixtures, args.min_time)]
+    report(results, load_baseline())
+
+    if args.save_baseline:
+        save_baseline(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Холодный старт обработчика навыка.
+Каждый замер выполняется в новом процессе интерпретатора:
+- время импорта модуля index по данным `python -X importtime` и сравнение с бюджетом;
+- время до первого ответа на приветствие и на запрос расписания (с локальной заменой сайта
+  и со снимком кэша, см. SSAU_SNAPSHOT_PATH), а также какие тяжёлые модули при этом загружены.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --check   # код возврата 1 при превышении бюджета импорта
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.stub_server import start_stub_server
+
+ROOT = Path(__file__).parent.parent
+
+# Бюджет на `import index` в миллисекундах
+IMPORT_BUDGET_MS = 30
+
+HEAVY_MODULES = ['requests', 'bs4', 'lxml', 'fuzzywuzzy', 'prettytable']
+
+# Скрипт выполняется в отдельном процессе: импортирует index, отвечает на один запрос и печатает результат
+FIRST_RESPONSE_SCRIPT = '''
+import copy, json, sys, time
+start = time.perf_counter()
+import index, run
+from parser import SSAUParser
+SSAUParser._URL = sys.argv[3] or SSAUParser._URL
+event = copy.deepcopy(run.request)
+event['session']['new'] = sys.argv[1] == ''
+event['request']['original_utterance'] = sys.argv[1]
+event['state']['user']['group_id'] = int(sys.argv[2])
+index.handler(event, None)
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({'ms': elapsed, 'modules': [m for m in json.loads(sys.argv[4]) if m in sys.modules]}))
+'''
+
+
+def import_time_ms(module: str) -> float:
+    """Суммарное время импорта модуля (столбец cumulative) по данным -X importtime"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    for line in output.splitlines()[::-1]:
+        _, cumulative, name = line.split('|')
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise ValueError(f'Module {module} not found in importtime output')
+
+
+def first_response(phrase: str, group_id: int, url: str = '', env: dict = None) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', FIRST_RESPONSE_SCRIPT, phrase, str(group_id), url, json.dumps(HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True, env={**os.environ, **(env or {})},
+    ).stdout
+    return json.loads(output)
+
+
+def create_snapshot(path: str, url: str, group_id: int):
+    """Заполняет кэш парсера с локальной замены сайта и сохраняет снимок"""
+    from parser import SSAUParser
+
+    SSAUParser._URL = url
+    numbers_week = [SSAUParser.get_number_week() + i for i in range(-1, 3)]
+    SSAUParser.get_weeks(group_id, numbers_week)
+    SSAUParser.save_snapshot(path, [group_id], numbers_week)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--runs', type=int, default=7)
+    arg_parser.add_argument('--check', action='store_true')
+    args = arg_parser.parse_args()
+
+    import_ms = statistics.median(import_time_ms('index') for _ in range(args.runs))
+    print(f'import index: {import_ms:.1f} ms (бюджет {IMPORT_BUDGET_MS} ms)')
+
+    group_id = 531030143
+    server, url = start_stub_server()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, 'snapshot.json')
+        create_snapshot(snapshot_path, url, group_id)
+
+        cases = {
+            'приветствие': ('', {}),
+            'помощь': ('помощь', {}),
+            'расписание, кэш пуст': ('расписание на завтра', {}),
+            'расписание, снимок кэша': ('расписание на завтра', {'SSAU_SNAPSHOT_PATH': snapshot_path}),
+        }
+        for name, (phrase, env) in cases.items():
+            runs = [first_response(phrase, group_id, url, env) for _ in range(args.runs)]
+            ms = statistics.median(run['ms'] for run in runs)
+            print(f"{name:<26} {ms:>8.1f} ms  загружены: {', '.join(runs[0]['modules']) or '-'}")
+    server.shutdown()
+
+    if args.check and import_ms > IMPORT_BUDGET_MS:
+        print('Превышен бюджет времени импорта')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Объём памяти, занимаемый одной закэшированной неделей.
+Разбирает записанные страницы много раз (как если бы в кэше лежали недели разных групп)
+и считает через tracemalloc, сколько байт приходится на одну неделю и на одну запись кэша (CacheEntry),
+в которой вместе с неделей лежат заголовки для перепроверки, а до разбора - ещё и HTML страницы.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --save-baseline
+"""
+import argparse
+import gc
+import tracemalloc
+
+import time
+
+import lxml_parser
+from benchmarks.common import load_baseline, load_html_fixtures, update_baseline
+from cache import CacheEntry
+
+BASELINE_KEY = 'memory: bytes per cached week'
+ENTRY_BASELINE_KEY = 'memory: bytes per cache entry'
+
+
+def bytes_per_week(pages: list[str], copies: int, freeze: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    weeks = []
+    for _ in range(copies):
+        for page in pages:
+            week = lxml_parser.create_week(page, 1)
+            weeks.append(week.freeze() if freeze else week)
+
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (size - start) / len(weeks)
+
+
+def bytes_per_entry(pages: list[str], copies: int, keep_html: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    entries = []
+    for _ in range(copies):
+        for page in pages:
+            # У каждой записи своя строка страницы, как после загрузки с сайта
+            entry = CacheEntry(page.encode('utf-8').decode('utf-8'), etag='"0123456789abcdef"',
+                               last_modified='Mon, 16 Sep 2024 08:00:00 GMT', expires_at=time.time() + 3600)
+            week = lxml_parser.create_week(entry.html, 1).freeze()
+            if keep_html:
+                entry.week = week
+            else:
+                entry.set_week(week)
+            entries.append(entry)
+
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (size - start) / len(entries)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--copies', type=int, default=50, help='сколько раз разобрать каждую страницу')
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    args = arg_parser.parse_args()
+
+    pages = list(load_html_fixtures().values())
+    baseline = load_baseline()
+
+    results = {
+        'Week': bytes_per_week(pages, args.copies, freeze=False),
+        'Week.freeze()': bytes_per_week(pages, args.copies, freeze=True),
+        'CacheEntry + HTML': bytes_per_entry(pages, args.copies, keep_html=True),
+        'CacheEntry': bytes_per_entry(pages, args.copies, keep_html=False),
+    }
+    baseline_keys = {'Week': BASELINE_KEY, 'Week.freeze()': BASELINE_KEY, 'CacheEntry': ENTRY_BASELINE_KEY}
+
+    for name, size in results.items():
+        comparison = ''
+        if before := baseline.get(baseline_keys.get(name)):
+            comparison = f'(baseline {before["bytes_per_week"]:.0f}, x{size / before["bytes_per_week"]:.2f})'
+        print(f'{name:<20} {size:>10.0f} байт на неделю {comparison}')
+
+    if args.save_baseline:
+        update_baseline({BASELINE_KEY: {'bytes_per_week': round(results['Week.freeze()'])},
+                         ENTRY_BASELINE_KEY: {'bytes_per_week': round(results['CacheEntry'])}})
+
+
+if __name__ == '__main__':
+    main()
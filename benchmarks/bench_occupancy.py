@@ -0,0 +1,119 @@
+"""
+Поиск свободных аудиторий (occupancy.RoomOccupancy) на синтетическом семестре всех групп
+в сравнении с перебором недель.
+Семестр генерируется детерминированно: --groups групп, 18 недель, аудитории из --buildings корпусов.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_occupancy
+    python -m benchmarks.bench_occupancy --save-baseline
+"""
+import argparse
+import datetime
+import random
+import time
+from itertools import cycle
+
+from benchmarks.common import Result, load_baseline, measure, report, save_baseline
+from occupancy import RoomOccupancy
+from schedule import Day, Pair, PairsSet, Week
+from schedule_index import place_building
+
+SEMESTER_START = datetime.date(2024, 9, 2)
+WEEKS = 18
+
+
+def generate_semester(groups: int, buildings: int, rooms_per_building: int,
+                      seed: int = 0) -> dict[tuple[int, int], Week]:
+    """Недели всех групп: у каждой группы 2-4 пары в день в случайных аудиториях"""
+    rng = random.Random(seed)
+    rooms = [f'{floor}{room:02} - {building} корп.'
+             for building in range(1, buildings + 1)
+             for floor, room in zip(cycle(range(1, 6)), range(rooms_per_building))]
+    disciplines = [f'Дисциплина {i}' for i in range(60)]
+
+    weeks = {}
+    for group in range(groups):
+        for number_week in range(1, WEEKS + 1):
+            monday = SEMESTER_START + datetime.timedelta(weeks=number_week - 1)
+            days = []
+            for weekday in range(6):
+                numbers = sorted(rng.sample(range(1, 7), rng.randint(2, 4)))
+                days.append(Day(monday + datetime.timedelta(days=weekday), [
+                    PairsSet(number, [Pair(rng.choice(disciplines), 'Преподаватель', rng.choice(rooms),
+                                           rng.randint(1, 3), {f'group-{group}'})])
+                    for number in numbers
+                ]))
+            weeks[(group, number_week)] = Week(number_week, days).freeze()
+    return weeks
+
+
+def scan_free_rooms(weeks: list[Week], rooms: set[str], date: datetime.date, number: int, count: int,
+                    building: str = None) -> list[str]:
+    """То же, что RoomOccupancy.free_rooms, перебором пар всех недель"""
+    occupied = set()
+    for week in weeks:
+        for day in week.days:
+            if day.date != date:
+                continue
+            for pairs_set in day.pairs:
+                if number <= pairs_set.number < number + count:
+                    occupied.update(pair.place for pair in pairs_set)
+    return sorted(room for room in rooms - occupied if building is None or place_building(room) == building)
+
+
+def bench(weeks: dict[tuple[int, int], Week], min_time: float) -> list[Result]:
+    occupancy = RoomOccupancy()
+    start = time.perf_counter()
+    for (group, _), week in weeks.items():
+        occupancy.update(group, week)
+    print(f'Построение: {time.perf_counter() - start:.2f} с, {len(weeks)} недель, {len(occupancy)} аудиторий')
+
+    rng = random.Random(1)
+    queries = [(SEMESTER_START + datetime.timedelta(days=rng.randrange(WEEKS * 7)), rng.randint(1, 4),
+                str(rng.randint(1, 5))) for _ in range(256)]
+    queries_iter = cycle(queries)
+
+    # Перебор выполняется только по неделям нужного номера, иначе сравнение было бы совсем нечестным
+    weeks_by_number = {}
+    for (_, number_week), week in weeks.items():
+        weeks_by_number.setdefault(number_week, []).append(week)
+    rooms = {room for week in weeks.values() for day in week.days for pairs_set in day.pairs
+             for room in (pair.place for pair in pairs_set)}
+
+    def scan(count: int, with_building: bool):
+        date, number, building = next(queries_iter)
+        number_week = (date - SEMESTER_START).days // 7 + 1
+        scan_free_rooms(weeks_by_number[number_week], rooms, date, number, count,
+                        building if with_building else None)
+
+    def lookup(count: int, with_building: bool):
+        date, number, building = next(queries_iter)
+        occupancy.free_rooms(date, number, count, building if with_building else None)
+
+    return [
+        measure('RoomOccupancy.free_rooms', lambda: lookup(1, False), min_time),
+        measure('RoomOccupancy.free_rooms[building]', lambda: lookup(1, True), min_time),
+        measure('RoomOccupancy.free_rooms[3 pairs]', lambda: lookup(3, True), min_time),
+        measure('scan weeks: free rooms', lambda: scan(1, False), min_time),
+        measure('scan weeks: free rooms[3 pairs]', lambda: scan(3, True), min_time),
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--groups', type=int, default=600, help='количество групп')
+    arg_parser.add_argument('--buildings', type=int, default=25, help='количество корпусов')
+    arg_parser.add_argument('--rooms', type=int, default=40, help='аудиторий в корпусе')
+    arg_parser.add_argument('--min-time', type=float, default=1.0, help='минимальное время замера, секунд')
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    args = arg_parser.parse_args()
+
+    weeks = generate_semester(args.groups, args.buildings, args.rooms)
+    results = bench(weeks, args.min_time)
+    report(results, load_baseline())
+    if args.save_baseline:
+        save_baseline(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Задержка разбора даты из фразы пользователя (index.parse_date_from_phrase) на корпусе типичных запросов к навыку.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_phrases
+    python -m benchmarks.bench_phrases --save-baseline
+"""
+import argparse
+from itertools import cycle
+
+import index
+from benchmarks.common import Result, load_baseline, measure, report, save_baseline
+
+UTTERANCES = [
+    'расписание на сегодня',
+    'какое расписание сегодня',
+    'что у меня сегодня',
+    'какие пары завтра',
+    'расписание на завтра',
+    'что у нас завтра по расписанию',
+    'а послезавтра',
+    'расписание на послезавтра',
+    'что было вчера',
+    'какие пары были вчера',
+    'расписание на понедельник',
+    'что во вторник',
+    'какие пары в среду',
+    'расписание на четверг',
+    'что у меня в пятницу',
+    'есть ли пары в субботу',
+    'расписание на следующий понедельник',
+    'что в следующий вторник',
+    'расписание на следующую среду',
+    'какие пары в следующую пятницу',
+    'что было в понедельник',
+    'какие пары были в четверг',
+    'расписание на 20 число',
+    'что у меня 5 числа',
+    'расписание на 1 сентября',
+    'какие пары 15 марта',
+    'расписание на 30 апреля',
+    'что будет 7 ноября',
+    'расписание через 3 дня',
+    'что будет через 10 дней',
+    'какие пары были 2 дня назад',
+    'расписание через 1 неделю',
+    'что через 2 недели',
+    '3 недели назад',
+    'расписание через 2 месяца',
+    '1 месяц назад',
+    'через 1 год',
+    'расписание на понидельник',
+    'расписание на читверг',
+    'расскажи анекдот',
+]
+
+
+def bench(min_time: float) -> list[Result]:
+    results = []
+    for utterance in UTTERANCES:
+        def parse(utterance=utterance):
+            try:
+                index.parse_date_from_phrase(utterance)
+            except ValueError:
+                pass
+
+        results.append(measure(f'parse_date_from_phrase[{utterance}]', parse, min_time, min_runs=50))
+
+    utterances_iter = cycle(UTTERANCES)
+
+    def parse_corpus():
+        try:
+            index.parse_date_from_phrase(next(utterances_iter))
+        except ValueError:
+            pass
+
+    results.append(measure('parse_date_from_phrase[corpus]', parse_corpus, min_time))
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--min-time', type=float, default=0.2, help='минимальное время замера одной фразы')
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    args = arg_parser.parse_args()
+
+    results = bench(args.min_time)
+    report(results, load_baseline())
+    if args.save_baseline:
+        save_baseline(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Масштабирование массовой загрузки (pipeline.ParsePipeline) по числу процессов-разборщиков
+в сравнении с загрузкой и разбором в потоках (SSAUParser.get_weeks).
+Страницы отдаёт локальная замена сайта с задержкой --latency, кэш перед каждым замером очищается.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_pipeline --weeks 60 --backend bs4
+    python -m benchmarks.bench_pipeline --save-baseline
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import load_baseline, load_html_fixtures, update_baseline
+from benchmarks.stub_server import start_stub_server
+from cache import MemoryCache
+from parser import SSAUParser
+from pipeline import ParsePipeline
+
+
+def run_threads(group_ids: list[int], numbers_week: range, fetch_workers: int) -> float:
+    SSAUParser.cache.clear()
+    start = time.perf_counter()
+    # get_weeks разбирает недели целиком в своих потоках, поэтому замер, как и у пула процессов, включает разбор
+    for group_id in group_ids:
+        SSAUParser.get_weeks(group_id, numbers_week, max_workers=fetch_workers)
+    return time.perf_counter() - start
+
+
+def run_pipeline(group_ids: list[int], numbers_week: range, fetch_workers: int, parse_workers: int) -> float:
+    with ParsePipeline(fetch_workers, parse_workers) as pipeline:
+        # Первый вызов запускает процессы, его не учитываем
+        pipeline.crawl(group_ids, numbers_week[:parse_workers])
+        SSAUParser.cache.clear()
+
+        start = time.perf_counter()
+        _, errors = pipeline.crawl(group_ids, numbers_week)
+        elapsed = time.perf_counter() - start
+
+    if errors:
+        raise RuntimeError(f'{len(errors)} ошибок, например {next(iter(errors.values()))}')
+    return elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--weeks', type=int, default=40, help='недель на группу')
+    arg_parser.add_argument('--backend', choices=('bs4', 'lxml'), default='bs4')
+    arg_parser.add_argument('--fetch-workers', type=int, default=16)
+    arg_parser.add_argument('--max-workers', type=int, default=os.cpu_count(), help='наибольшее число процессов')
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='задержка заглушки сайта, секунд')
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    args = arg_parser.parse_args()
+
+    group_ids = sorted({group_id for group_id, _ in load_html_fixtures()})
+    numbers_week = range(1, args.weeks + 1)
+    pages = len(group_ids) * len(numbers_week)
+
+    server, SSAUParser._URL = start_stub_server(latency=args.latency)
+    SSAUParser.cache = MemoryCache(pages * 2)
+    SSAUParser.backend = args.backend
+    print(f'{pages} страниц, разбор {args.backend}, ядер: {os.cpu_count()}')
+
+    results = {f'crawl[{args.backend}, threads]': pages / run_threads(group_ids, numbers_week, args.fetch_workers)}
+    workers = 1
+    while workers <= args.max_workers:
+        elapsed = run_pipeline(group_ids, numbers_week, args.fetch_workers, workers)
+        results[f'crawl[{args.backend}, {workers} processes]'] = pages / elapsed
+        workers *= 2
+    server.shutdown()
+
+    baseline = load_baseline()
+    for name, pages_per_sec in results.items():
+        comparison = ''
+        if before := baseline.get(name):
+            comparison = f"x{pages_per_sec / before['pages_per_sec']:.2f}"
+        print(f'{name:<32} {pages_per_sec:>8.1f} страниц/с {comparison}')
+
+    if args.save_baseline:
+        update_baseline({name: {'pages_per_sec': round(value, 1)} for name, value in results.items()})
+
+
+if __name__ == '__main__':
+    main()
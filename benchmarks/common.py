@@ -0,0 +1,94 @@
+"""Общие функции бенчмарков: замер времени, перцентили, отчёт и сравнение с сохранённым baseline"""
+import json
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.stub_server import FIXTURES_DIR, load_pages
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+
+
+@dataclass
+class Result:
+    """Результат одного бенчмарка, времена в наносекундах"""
+    name: str
+    timings: list[int]
+
+    def percentile(self, percent: float) -> float:
+        """Перцентиль в миллисекундах (метод ближайшего ранга)"""
+        ordered = sorted(self.timings)
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return ordered[rank - 1] / 1e6
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    @property
+    def throughput(self) -> float:
+        """Количество вызовов в секунду"""
+        return len(self.timings) / (sum(self.timings) / 1e9)
+
+    def to_dict(self) -> dict:
+        return {'p50_ms': round(self.p50, 4), 'p99_ms': round(self.p99, 4), 'ops_per_sec': round(self.throughput, 1)}
+
+
+def load_html_fixtures() -> dict[tuple[int, int], str]:
+    """Записанные страницы расписания: (groupId, selectedWeek) -> HTML"""
+    return {key: page.decode('utf-8') for key, page in load_pages(FIXTURES_DIR).items()}
+
+
+def measure(name: str, func: Callable[[], object], min_time: float = 1.0, min_runs: int = 20) -> Result:
+    """Вызывает func, пока не наберётся min_runs вызовов и не пройдёт min_time секунд"""
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        func()
+        timings.append(time.perf_counter_ns() - start)
+    return Result(name, timings)
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def save_baseline(results: list[Result], path: Path = BASELINE_PATH):
+    """Дописывает результаты в baseline, не трогая записи других бенчмарков"""
+    update_baseline({result.name: result.to_dict() for result in results}, path)
+
+
+def update_baseline(entries: dict[str, dict], path: Path = BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline.update(entries)
+    path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False, sort_keys=True) + '\n', encoding='utf-8')
+
+
+def report(results: list[Result], baseline: dict[str, dict], tolerance: float = 0.2) -> list[str]:
+    """
+    Печатает таблицу результатов и сравнение p50 с baseline.
+    Возвращает имена бенчмарков, у которых p50 хуже baseline больше чем на tolerance.
+    """
+    regressions = []
+    print(f"{'benchmark':<42} {'runs':>7} {'ops/s':>10} {'p50, ms':>9} {'p99, ms':>9} {'vs baseline':>12}")
+    for result in results:
+        comparison = ''
+        if base := baseline.get(result.name):
+            ratio = result.p50 / base['p50_ms']
+            comparison = f'x{ratio:.2f}'
+            if ratio > 1 + tolerance:
+                comparison += ' !'
+                regressions.append(result.name)
+
+        print(f"{result.name:<42} {len(result.timings):>7} {result.throughput:>10.1f} "
+              f"{result.p50:>9.3f} {result.p99:>9.3f} {comparison:>12}")
+    return regressions
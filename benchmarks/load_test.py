@@ -0,0 +1,175 @@
+"""
+Нагрузочный тест навыка: воспроизводит запросы Алисы (в формате run.request) с заданной частотой
+против локальной замены ssau.ru с настраиваемой задержкой и долей ошибок.
+Печатает p50/p95/p99 задержки, пропускную способность и долю ошибок.
+
+Запросы отправляются по расписанию (открытая модель нагрузки): задержка считается от запланированного
+момента отправки, поэтому, если обработчик не успевает, ожидание в очереди тоже попадает в задержку.
+С --rps 0 запросы отправляются без пауз, насколько позволяет --concurrency.
+
+Запуск из корня проекта:
+    python -m benchmarks.load_test --rps 50 --concurrency 16 --duration 30
+    python -m benchmarks.load_test --latency 0.3 --error-rate 0.05 --cache-ttl 5
+    python -m benchmarks.load_test --corpus requests.jsonl --json   # свои запросы, по одному JSON в строке
+"""
+import argparse
+import copy
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import index
+import run
+from benchmarks.bench_phrases import UTTERANCES
+from benchmarks.common import Result, load_html_fixtures
+from benchmarks.stub_server import start_stub_server
+from cache import MemoryCache
+
+# Ответы обработчика, означающие, что расписание получить не удалось
+ERROR_MARKERS = (
+    'Извините сайт не отвечает',
+    'Сайт с расписанием слишком долго не отвечает',
+    'Не удаётся установить соединение',
+    'Сайт с расписанием отвечает медленно',
+)
+
+SERVICE_UTTERANCES = ['', 'помощь', 'спасибо']
+
+
+def build_corpus(group_ids: list[int], size: int, seed: int = 0) -> list[dict]:
+    """Запросы пользователей: в основном вопросы о расписании, изредка приветствие, помощь и смена группы"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        event = copy.deepcopy(run.request)
+        event['session']['new'] = False
+        event['state']['user']['group_id'] = rng.choice(group_ids)
+
+        roll = rng.random()
+        if roll < 0.05:
+            utterance = rng.choice(SERVICE_UTTERANCES)
+            event['session']['new'] = utterance == ''
+        elif roll < 0.07:
+            utterance = str(rng.choice(group_ids))
+        else:
+            utterance = rng.choice(UTTERANCES)
+        event['request']['original_utterance'] = event['request']['command'] = utterance
+        corpus.append(event)
+    return corpus
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+@dataclass
+class LoadStats:
+    latencies: list[int] = field(default_factory=list)
+    errors: int = 0
+    exceptions: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, latency_ns: int, error: bool, exception: bool):
+        with self.lock:
+            self.latencies.append(latency_ns)
+            self.errors += error or exception
+            self.exceptions += exception
+
+
+def run_load(corpus: list[dict], rps: float, concurrency: int, duration: float) -> tuple[LoadStats, float]:
+    """Отправляет запросы из корпуса по кругу в течение duration секунд. Вернёт статистику и фактическое время"""
+    stats = LoadStats()
+
+    def send(event: dict, scheduled: int):
+        error = exception = False
+        try:
+            text = index.handler(event, None)['response']['text']
+            error = text.startswith(ERROR_MARKERS)
+        except Exception:
+            exception = True
+        stats.record(time.perf_counter_ns() - scheduled, error, exception)
+
+    start = time.perf_counter_ns()
+    end = start + int(duration * 1e9)
+    interval = int(1e9 / rps) if rps > 0 else 0
+    # Не больше concurrency запросов одновременно в работе (столько же, сколько потоков), чтобы при --rps 0
+    # запросы не копились в очереди пула и её ожидание не попадало в задержку
+    slots = threading.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(sys.maxsize):
+            scheduled = start + i * interval
+            if scheduled >= end or (not interval and time.perf_counter_ns() >= end):
+                break
+            if (delay := scheduled - time.perf_counter_ns()) > 0:
+                time.sleep(delay / 1e9)
+            if not interval:
+                scheduled = time.perf_counter_ns()
+
+            slots.acquire()
+            future = executor.submit(send, corpus[i % len(corpus)], scheduled)
+            future.add_done_callback(lambda _: slots.release())
+
+    return stats, (time.perf_counter_ns() - start) / 1e9
+
+
+def summary(stats: LoadStats, elapsed: float) -> dict:
+    result = Result('load', stats.latencies)
+    total = len(stats.latencies)
+    return {
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 1),
+        'p50_ms': round(result.percentile(50), 2),
+        'p95_ms': round(result.percentile(95), 2),
+        'p99_ms': round(result.percentile(99), 2),
+        'max_ms': round(max(stats.latencies) / 1e6, 2),
+        'error_rate': round(stats.errors / total, 4),
+        'exceptions': stats.exceptions,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rps', type=float, default=50, help='запросов в секунду, 0 - без ограничения')
+    arg_parser.add_argument('--concurrency', type=int, default=16, help='одновременно обрабатываемых запросов')
+    arg_parser.add_argument('--duration', type=float, default=10, help='длительность теста, секунд')
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='средняя задержка заглушки сайта, секунд')
+    arg_parser.add_argument('--error-rate', type=float, default=0, help='доля ответов 503 от заглушки сайта')
+    arg_parser.add_argument('--cache-ttl', type=float, help='время жизни страницы в кэше, по умолчанию как в парсере')
+    arg_parser.add_argument('--corpus', help='файл с запросами Алисы, по одному JSON в строке')
+    arg_parser.add_argument('--json', action='store_true', help='напечатать итог одной JSON строкой')
+    args = arg_parser.parse_args()
+
+    group_ids = sorted({group_id for group_id, _ in load_html_fixtures()})
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(group_ids, 1000)
+
+    server, url = start_stub_server(latency=args.latency, error_rate=args.error_rate)
+    parser = index.get_parser()
+    parser._URL = url
+    parser.cache = MemoryCache()
+    if args.cache_ttl is not None:
+        parser.CACHE_TTL = args.cache_ttl
+
+    try:
+        stats, elapsed = run_load(corpus, args.rps, args.concurrency, args.duration)
+    finally:
+        server.shutdown()
+
+    result = summary(stats, elapsed)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(f"{result['requests']} запросов за {elapsed:.1f} с, {result['throughput_rps']} в секунду")
+    print(f"задержка p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+          f"max {result['max_ms']} ms")
+    print(f"ошибки: {result['error_rate']:.2%} (исключений: {result['exceptions']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Локальная замена сайта ssau.ru для бенчмарков.
+Отдаёт записанные страницы расписания из каталога fixtures, файлы называются <groupId>_<selectedWeek>.html.
+Если нужной недели нет, отдаётся первая записанная неделя группы, для неизвестной группы - 404.
+Для нагрузочного тестирования можно добавить задержку ответа и долю ответов 503.
+
+Запуск: python -m benchmarks.stub_server --port 8080 --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def load_pages(fixtures_dir: Path = FIXTURES_DIR) -> dict[tuple[int, int], bytes]:
+    """Загружает записанные страницы в словарь (groupId, selectedWeek) -> HTML"""
+    pages = {}
+    for path in sorted(fixtures_dir.glob('*.html')):
+        group_id, number_week = map(int, path.stem.split('_'))
+        pages[(group_id, number_week)] = path.read_bytes()
+    return pages
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    pages: dict[tuple[int, int], bytes] = {}
+    # Задержка ответа в секундах: случайная, равномерно от latency * (1 - jitter) до latency * (1 + jitter)
+    latency: float = 0
+    jitter: float = 0.5
+    # Доля запросов, на которые сервер отвечает 503
+    error_rate: float = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _find_page(self) -> bytes | None:
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            group_id = int(query['groupId'][0])
+        except (KeyError, ValueError):
+            return None
+
+        if 'selectedWeek' in query and (page := self.pages.get((group_id, int(query['selectedWeek'][0])))):
+            return page
+        return next((page for (g, _), page in sorted(self.pages.items()) if g == group_id), None)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+        if self.error_rate and random.random() < self.error_rate:
+            self.send_error(503)
+            return
+
+        if (page := self._find_page()) is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0, fixtures_dir: Path = FIXTURES_DIR,
+                      latency: float = 0, error_rate: float = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Запускает сервер в фоновом потоке и возвращает его вместе с адресом для SSAUParser._URL"""
+    handler = type('Handler', (StubHandler,), {'pages': load_pages(fixtures_dir),
+                                               'latency': latency, 'error_rate': error_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/rasp'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--latency', type=float, default=0, help='средняя задержка ответа, секунд')
+    arg_parser.add_argument('--error-rate', type=float, default=0, help='доля ответов 503')
+    args = arg_parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f'Сервер запущен: {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
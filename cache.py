@@ -0,0 +1,327 @@
+"""
+Кэш загруженных страниц расписания.
+Запись хранит исходный HTML страницы, заголовки для условной перепроверки (ETag/Last-Modified),
+дату начала семестра со страницы и уже разобранную неделю,
+чтобы повторные запросы не обращались ни к сайту, ни к парсеру.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+import serialization
+from schedule import LazyDays, Week
+
+
+@dataclass
+class CacheEntry:
+    """Запись кэша для одной страницы расписания"""
+    html: str
+    etag: str = None
+    last_modified: str = None
+    expires_at: float = 0.0
+    week: Week = None
+    # Дата начала семестра группы со страницы, по ней после перезапуска восстанавливается календарь семестра
+    semester_start: datetime.date = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def set_week(self, week: Week):
+        """
+        Запоминает разобранную неделю и отпускает HTML страницы: он занимает в разы больше недели,
+        а для перепроверки страницы достаточно ETag/Last-Modified
+        """
+        self.week = week
+        self.html = ''
+
+
+class ScheduleCache(ABC):
+    """
+    Базовый класс кэша страниц.
+    Просроченные записи не удаляются сразу: они нужны для условной перепроверки,
+    а из кэша вытесняются только давно не использованные записи сверх max_size.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> CacheEntry | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class MemoryCache(ScheduleCache):
+    """
+    LRU кэш в памяти процесса.
+    on_evict(key, entry) вызывается для каждой вытесненной записи,
+    например TieredCache сохраняет её во второй уровень.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.on_evict: Callable[[str, CacheEntry], None] | None = None
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted.append(self._entries.popitem(last=False))
+
+        if self.on_evict is not None:
+            for evicted_key, evicted_entry in evicted:
+                self.on_evict(evicted_key, evicted_entry)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(ScheduleCache):
+    """
+    Кэш на диске в базе SQLite. Переживает перезапуск процесса,
+    в том числе холодный старт serverless функции, если путь указывает на сохраняемый каталог.
+    Разобранная неделя сохраняется вместе со страницей (см. serialization), поэтому после перезапуска
+    страницу не нужно разбирать заново. Дата начала семестра хранится в формате ISO.
+    Время последнего обращения копится в памяти и записывается в базу пачкой не чаще раза в
+    ACCESS_FLUSH_INTERVAL секунд (и перед вытеснением), чтобы чтение не писало на диск.
+    Вытеснение выполняется, только когда записей больше max_size. Число записей ведётся в памяти и пересчитывается
+    перед вытеснением, поэтому записи других процессов, работающих с той же базой, учитываются с опозданием.
+    """
+
+    ACCESS_FLUSH_INTERVAL = 60
+
+    def __init__(self, path: str, max_size: int = 10_000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._accessed: dict[str, float] = {}
+        self._flushed_at = time.monotonic()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'key TEXT PRIMARY KEY, html TEXT NOT NULL, etag TEXT, last_modified TEXT, '
+            'expires_at REAL NOT NULL, accessed_at REAL NOT NULL, week BLOB, semester_start TEXT)'
+        )
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(pages)')]
+        if 'week' not in columns:
+            self._connection.execute('ALTER TABLE pages ADD COLUMN week BLOB')
+        if 'semester_start' not in columns:
+            self._connection.execute('ALTER TABLE pages ADD COLUMN semester_start TEXT')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)')
+        self._size = self._count()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT html, etag, last_modified, expires_at, week, semester_start FROM pages WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if time.monotonic() - self._flushed_at >= self.ACCESS_FLUSH_INTERVAL:
+                self._flush_accessed()
+
+        *page, week, semester_start = row
+        try:
+            week = serialization.loads(week) if week is not None else None
+        except ValueError:
+            # Неделя записана старой версией формата, её придётся разобрать заново
+            week = None
+        if week is None and not page[0]:
+            # HTML отпускается после разбора (см. CacheEntry.set_week), без недели разбирать нечего
+            return None
+        return CacheEntry(*page, week=week, semester_start=_parse_date(semester_start))
+
+    def set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            if self._connection.execute('SELECT 1 FROM pages WHERE key = ?', (key,)).fetchone() is None:
+                self._size += 1
+            self._connection.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, entry.html, entry.etag, entry.last_modified, entry.expires_at, time.time(),
+                 serialization.dumps(entry.week) if entry.week is not None else None,
+                 entry.semester_start.isoformat() if entry.semester_start is not None else None)
+            )
+            self._accessed.pop(key, None)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """Удаляет давно не использованные записи сверх max_size. Вызывается под self._lock"""
+        self._size = self._count()
+        if self._size <= self.max_size:
+            return
+
+        self._flush_accessed()
+        cursor = self._connection.execute(
+            'DELETE FROM pages WHERE key IN '
+            '(SELECT key FROM pages ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)', (self.max_size,)
+        )
+        self._size -= cursor.rowcount
+
+    def _count(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def _flush_accessed(self):
+        """Записывает накопленные времена обращений. Вызывается под self._lock"""
+        if self._accessed:
+            self._connection.executemany('UPDATE pages SET accessed_at = ? WHERE key = ?',
+                                         [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+            self._accessed.clear()
+        self._flushed_at = time.monotonic()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._size -= self._connection.execute('DELETE FROM pages WHERE key = ?', (key,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._connection.execute('DELETE FROM pages')
+            self._size = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+
+class TieredCache(ScheduleCache):
+    """
+    Двухуровневый кэш: быстрый кэш в памяти перед медленным (например, на диске).
+    Записи, найденные во втором уровне, поднимаются в первый вместе с разобранной неделей.
+    Второй уровень сериализует неделю целиком, поэтому ленивая неделя (см. schedule.LazyDays), разобранная
+    не полностью, записывается в него, только когда все её дни будут разобраны обращениями к ним
+    или когда запись вытеснят из первого уровня.
+    """
+
+    def __init__(self, front: ScheduleCache, back: ScheduleCache):
+        self.front = front
+        self.back = back
+        # Записи с ленивыми неделями, которые ещё не записаны во второй уровень
+        self._pending: dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+        if isinstance(front, MemoryCache):
+            front.on_evict = self._persist
+
+    def get(self, key: str) -> CacheEntry | None:
+        if (entry := self.front.get(key)) is not None:
+            return entry
+
+        if (entry := self.back.get(key)) is not None:
+            self.front.set(key, entry)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        self.front.set(key, entry)
+        if entry.week is not None and isinstance(entry.week.days, LazyDays) and not entry.week.days.complete:
+            with self._lock:
+                self._pending[key] = entry
+            entry.week.days.when_complete(lambda: self._persist(key, entry))
+            return
+
+        with self._lock:
+            self._pending.pop(key, None)
+        self.back.set(key, entry)
+
+    def _persist(self, key: str, entry: CacheEntry):
+        """Записывает во второй уровень отложенную запись, если её ещё не заменили и не записали"""
+        with self._lock:
+            if self._pending.get(key) is not entry:
+                return
+            del self._pending[key]
+        self.back.set(key, entry)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+        self.front.delete(key)
+        self.back.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+        self.front.clear()
+        self.back.clear()
+
+
+def create_default_cache() -> ScheduleCache:
+    """
+    Создаёт кэш по переменным окружения:
+    SSAU_CACHE_PATH - путь к файлу SQLite, если не задан, то используется только кэш в памяти;
+    SSAU_CACHE_SIZE - максимальное количество записей в кэше в памяти;
+    SSAU_DISK_CACHE_SIZE - максимальное количество записей в SQLite. Он должен вмещать всё, что загружает
+    prefetch.py (группы * недели), иначе загрузка вытеснит из него только что загруженные страницы.
+    """
+    memory_cache = MemoryCache(int(os.environ.get('SSAU_CACHE_SIZE', 1024)))
+
+    if path := os.environ.get('SSAU_CACHE_PATH'):
+        return TieredCache(memory_cache, SQLiteCache(path, int(os.environ.get('SSAU_DISK_CACHE_SIZE', 50_000))))
+    return memory_cache
+
+
+def save_snapshot(path: str, entries: dict[str, CacheEntry]):
+    """
+    Сохраняет записи кэша с разобранными неделями в JSON файл (снимок).
+    Снимок можно положить рядом с serverless функцией, чтобы холодный старт сразу имел заполненный кэш.
+    HTML страниц в снимок не попадает, только неделя, заголовки для перепроверки и дата начала семестра.
+    """
+    data = {
+        key: {'etag': entry.etag, 'last_modified': entry.last_modified, 'expires_at': entry.expires_at,
+              'week': serialization.dumps(entry.week).decode('utf-8'),
+              'semester_start': entry.semester_start.isoformat() if entry.semester_start is not None else None}
+        for key, entry in entries.items() if entry.week is not None
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+
+
+def load_snapshot(path: str) -> dict[str, CacheEntry]:
+    """Загружает записи кэша из снимка, сохранённого save_snapshot"""
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+
+    return {
+        key: CacheEntry('', item['etag'], item['last_modified'], item['expires_at'],
+                        serialization.loads(item['week']), _parse_date(item.get('semester_start')))
+        for key, item in data.items()
+    }
+
+
+def _parse_date(value: str | None) -> datetime.date | None:
+    return datetime.date.fromisoformat(value) if value is not None else None
@@ -0,0 +1,143 @@
+"""
+Обнаружение изменений в расписании.
+Каждый день недели сравнивается по хэшу содержимого (Day.content_hash), и только у изменившихся дней
+пары сопоставляются между собой: так выясняется, какие пары добавились, пропали, перенесены
+или сменили преподавателя либо аудиторию.
+ChangePoller хранит между запусками только хэши дней, а не сами недели.
+"""
+import datetime
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from schedule import Day, Pair, Week
+
+Slot = tuple[datetime.date, int]
+
+
+@dataclass
+class PairChange:
+    """Изменение одной пары. Для добавленной пары old_slot пустой, для удалённой - new_slot"""
+    pair: Pair
+    old_slot: Slot = None
+    new_slot: Slot = None
+    old_pair: Pair = None
+
+
+@dataclass
+class WeekDiff:
+    added: list[PairChange] = field(default_factory=list)
+    removed: list[PairChange] = field(default_factory=list)
+    moved: list[PairChange] = field(default_factory=list)
+    teacher_changed: list[PairChange] = field(default_factory=list)
+    place_changed: list[PairChange] = field(default_factory=list)
+    changed_days: list[datetime.date] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.changed_days)
+
+
+def day_hashes(week: Week) -> dict[str, str]:
+    """Хэши содержимого дней недели по дате в формате ISO"""
+    return {day.date.isoformat(): day.content_hash() for day in week.days}
+
+
+def _slots(days: list[Day]) -> dict[tuple, list[tuple[Slot, Pair]]]:
+    """Пары изменившихся дней, сгруппированные по identity пары"""
+    slots = defaultdict(list)
+    for day in days:
+        for pairs_set in day.pairs:
+            for pair in pairs_set.pairs_set:
+                slots[pair.identity].append(((day.date, pairs_set.number), pair))
+    return slots
+
+
+def diff_weeks(old: Week, new: Week) -> WeekDiff:
+    """
+    Структурная разница между двумя версиями одной недели.
+    Пара считается той же самой, если совпадают дисциплина, тип и группы (Pair.identity).
+    Сначала сопоставляются пары, оставшиеся на своём месте, затем оставшиеся по порядку считаются перенесёнными.
+    """
+    old_days = {day.date: day for day in old.days}
+    new_days = {day.date: day for day in new.days}
+    changed_dates = sorted(
+        date for date in old_days.keys() | new_days.keys()
+        if date not in old_days or date not in new_days
+        or old_days[date].content_hash() != new_days[date].content_hash()
+    )
+
+    diff = WeekDiff(changed_days=changed_dates)
+    if not changed_dates:
+        return diff
+
+    old_slots = _slots([old_days[date] for date in changed_dates if date in old_days])
+    new_slots = _slots([new_days[date] for date in changed_dates if date in new_days])
+
+    for identity in old_slots.keys() | new_slots.keys():
+        olds = old_slots.get(identity, [])
+        news = new_slots.get(identity, [])
+
+        matched = []
+        for old_item in list(olds):
+            for new_item in news:
+                if new_item[0] == old_item[0]:
+                    matched.append((old_item, new_item))
+                    olds.remove(old_item)
+                    news.remove(new_item)
+                    break
+
+        for new_item in news[len(olds):]:
+            diff.added.append(PairChange(new_item[1], new_slot=new_item[0]))
+        for old_item in olds[len(news):]:
+            diff.removed.append(PairChange(old_item[1], old_slot=old_item[0]))
+        for old_item, new_item in zip(olds, news):
+            diff.moved.append(PairChange(new_item[1], old_item[0], new_item[0], old_item[1]))
+            matched.append((old_item, new_item))
+
+        for (old_slot, old_pair), (new_slot, new_pair) in matched:
+            change = PairChange(new_pair, old_slot, new_slot, old_pair)
+            if old_pair.teacher != new_pair.teacher:
+                diff.teacher_changed.append(change)
+            if old_pair.place != new_pair.place:
+                diff.place_changed.append(change)
+
+    return diff
+
+
+class ChangePoller:
+    """
+    Периодическая проверка расписания групп на изменения.
+    В JSON файле store_path хранятся только хэши дней по ключу "группа:неделя",
+    поэтому неизменившиеся дни не нужно ни перерисовывать, ни заново выгружать.
+    """
+
+    def __init__(self, store_path: str | None = None):
+        self.store_path = store_path
+        self.hashes: dict[str, dict[str, str]] = {}
+
+        if store_path and os.path.exists(store_path):
+            with open(store_path, encoding='utf-8') as file:
+                self.hashes = json.load(file)
+
+    def changed_days(self, key: str, week: Week) -> list[Day]:
+        """Вернёт дни недели, хэш которых отличается от сохранённого, и запомнит новые хэши"""
+        old_hashes = self.hashes.get(key, {})
+        new_hashes = day_hashes(week)
+        self.hashes[key] = new_hashes
+        return [day for day in week.days if old_hashes.get(day.date.isoformat()) != new_hashes[day.date.isoformat()]]
+
+    def poll(self, group_id: int, number_week: int) -> list[Day]:
+        """Загружает неделю и возвращает только изменившиеся с прошлой проверки дни"""
+        from parser import SSAUParser
+
+        return self.changed_days(f'{group_id}:{number_week}', SSAUParser.get_week(group_id, number_week))
+
+    def save(self):
+        if not self.store_path:
+            return
+
+        tmp_path = f'{self.store_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.hashes, file)
+        os.replace(tmp_path, self.store_path)
@@ -0,0 +1,240 @@
+"""
+HTTP сервер календарей для подписки: /<group_id>.ics или /<group_id>.ics?subgroup=N.
+По адресу /metrics отдаются метрики в формате Prometheus (см. metrics).
+Календарные приложения опрашивают такой адрес часто, поэтому готовый календарь хранится в памяти,
+а ETag зависит только от содержимого недель: пока расписание не изменилось, клиент получает 304 без тела,
+и календарь не генерируется заново.
+
+Пример:
+    SSAU_CACHE_PATH=/data/ssau.db python feed_server.py --port 8000 --warm 531030143 799359428
+"""
+import argparse
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import metrics
+from parser import SSAUParser
+from ratelimit import Priority, upstream_priority
+from singleflight import SingleFlight
+from to_ics import filter_by_subgroup, generate_ics_from_week
+
+_PATH_RE = re.compile(r'/(\d+)\.ics')
+# Один тег в списке If-None-Match, возможно слабый (W/"...")
+_ETAG_RE = re.compile(r'(?:W/)?("[^"]*")')
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Проверка заголовка If-None-Match (RFC 9110, 13.1.2): список тегов через запятую или *.
+    Сравнение слабое, то есть W/"x" совпадает с "x".
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    opaque_tag = _ETAG_RE.fullmatch(etag).group(1)
+    return opaque_tag in _ETAG_RE.findall(if_none_match)
+
+
+class UnknownSubgroup(LookupError):
+    """Подгруппы нет в неделях календаря группы"""
+
+
+@dataclass
+class Feed:
+    """Готовый календарь группы (и подгруппы)"""
+    body: bytes
+    etag: str
+    # Время последней проверки недель на изменения по time.monotonic()
+    checked_at: float
+
+
+class FeedStore:
+    """
+    Календари групп в памяти.
+    Не чаще чем раз в check_interval секунд недели календаря запрашиваются у SSAUParser (обычно из его кэша),
+    и календарь генерируется заново, только если изменился хэш их содержимого.
+    Группа и подгруппа берутся из адреса, поэтому хранится не больше max_feeds давно не запрошенных календарей,
+    а подгруппы, которой нет в неделях группы, календарь не создаётся (UnknownSubgroup).
+    """
+
+    def __init__(self, weeks_before: int = 1, weeks_ahead: int = 8, check_interval: float = 300,
+                 max_feeds: int = 1024):
+        self.weeks_before = weeks_before
+        self.weeks_ahead = weeks_ahead
+        self.check_interval = check_interval
+        self.max_feeds = max_feeds
+        self._feeds: OrderedDict[tuple[int, int | None], Feed] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def numbers_week(self, group_id: int = None) -> range:
+        """Недели, попадающие в календарь: немного прошедших, текущая и несколько следующих"""
+        current_week = SSAUParser.get_number_week(group_id=group_id)
+        return range(max(current_week - self.weeks_before, 1), current_week + self.weeks_ahead + 1)
+
+    def get(self, group_id: int, subgroup: int = None) -> Feed:
+        key = (group_id, subgroup)
+        with self._lock:
+            if (feed := self._feeds.get(key)) is not None:
+                self._feeds.move_to_end(key)
+        if feed is not None and time.monotonic() - feed.checked_at < self.check_interval:
+            return feed
+
+        return self._flight.do(key, lambda: self._refresh(group_id, subgroup, feed))
+
+    def _store(self, key: tuple[int, int | None], feed: Feed):
+        with self._lock:
+            self._feeds[key] = feed
+            self._feeds.move_to_end(key)
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+
+    def __len__(self):
+        return len(self._feeds)
+
+    def _refresh(self, group_id: int, subgroup: int | None, feed: Feed | None) -> Feed:
+        try:
+            # Календарные приложения опрашивают адрес в фоне, запросы пользователей навыка важнее
+            with upstream_priority(Priority.BACKGROUND):
+                weeks = SSAUParser.get_weeks(group_id, self.numbers_week(group_id))
+        except OSError:
+            # Сайт недоступен: клиенту лучше получить прошлую версию календаря, чем ошибку
+            if feed is None:
+                raise
+            return feed
+
+        if subgroup:
+            subgroups = {number for week in weeks for day in week.days for pairs_set in day.pairs
+                         for pair in pairs_set for number in pair.subgroups}
+            if not subgroups:
+                # В неделях нет деления на подгруппы, календарь подгруппы совпадает с календарём группы
+                subgroup, feed = None, self._feeds.get((group_id, None))
+            elif subgroup not in subgroups:
+                raise UnknownSubgroup(f'Group {group_id} has no subgroup {subgroup}.')
+
+        source = '|'.join([str(subgroup), *(week.content_hash() for week in weeks)])
+        etag = f'"{hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()}"'
+
+        if feed is not None and feed.etag == etag:
+            feed.checked_at = time.monotonic()
+            return feed
+
+        if subgroup:
+            weeks = [filter_by_subgroup(week, subgroup) for week in weeks]
+        feed = Feed(generate_ics_from_week(weeks).encode('utf-8'), etag, time.monotonic())
+        self._store((group_id, subgroup), feed)
+        return feed
+
+    def warm(self, group_ids: list[int], subgroups: list[int | None] = (None,)):
+        """Заранее генерирует календари, чтобы первые запросы клиентов не ждали сайт"""
+        for group_id in group_ids:
+            for subgroup in subgroups:
+                try:
+                    self.get(group_id, subgroup)
+                except (OSError, UnknownSubgroup) as error:
+                    print(f'Группа {group_id}: {error}')
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    store: FeedStore = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/metrics':
+            self._send_metrics()
+            return
+
+        if not (match := _PATH_RE.fullmatch(url.path)):
+            self.send_error(404)
+            return
+
+        try:
+            subgroup = int(query['subgroup'][0]) if 'subgroup' in query else None
+        except ValueError:
+            self.send_error(400, 'subgroup must be a number')
+            return
+
+        try:
+            feed = self.store.get(int(match.group(1)), subgroup)
+        except UnknownSubgroup:
+            self.send_error(404, 'unknown subgroup')
+            return
+        except OSError:
+            self.send_error(502)
+            return
+
+        if etag_matches(self.headers.get('If-None-Match'), feed.etag):
+            self.send_response(304)
+            self._send_cache_headers(feed)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+        self.send_header('Content-Length', str(len(feed.body)))
+        self._send_cache_headers(feed)
+        self.end_headers()
+        self.wfile.write(feed.body)
+
+    def _send_metrics(self):
+        body = metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cache_headers(self, feed: Feed):
+        self.send_header('ETag', feed.etag)
+        self.send_header('Cache-Control', f'max-age={int(self.store.check_interval)}')
+
+
+def start_feed_server(store: FeedStore, host: str = '127.0.0.1', port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Запускает сервер в фоновом потоке и возвращает его вместе с адресом"""
+    handler = type('Handler', (FeedHandler,), {'store': store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8000)
+    arg_parser.add_argument('--weeks-before', type=int, default=1, help='сколько прошедших недель включать')
+    arg_parser.add_argument('--weeks-ahead', type=int, default=8, help='сколько следующих недель включать')
+    arg_parser.add_argument('--check-interval', type=float, default=300,
+                            help='не чаще скольких секунд проверять расписание на изменения')
+    arg_parser.add_argument('--rate', type=float, default=5, help='не больше стольких запросов к сайту в секунду')
+    arg_parser.add_argument('--max-feeds', type=int, default=1024, help='сколько календарей хранить в памяти')
+    arg_parser.add_argument('--warm', type=int, nargs='*', default=[], help='id групп для заблаговременной генерации')
+    args = arg_parser.parse_args()
+
+    SSAUParser.configure(read_timeout=30, retries=5, rate_limit=args.rate)
+    SSAUParser.backend = 'lxml'
+
+    store = FeedStore(args.weeks_before, args.weeks_ahead, args.check_interval, args.max_feeds)
+    server, url = start_feed_server(store, args.host, args.port)
+    print(f'Сервер запущен: {url}/<group_id>.ics?subgroup=<N>')
+    store.warm(args.warm)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
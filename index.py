@@ -1,15 +1,59 @@
 import calendar
 import datetime
+import os
 import re
+from functools import cache
 
-from fuzzywuzzy import process
-from requests import HTTPError, ConnectionError
+import metrics
+from schedule import Day, PairsSet
+from views import DayView
 
-from parser import SSAUParser
-from schedule import Day
+# Модуль загружается на каждом холодном старте serverless функции, поэтому тяжёлые зависимости
+# (парсер с requests, bs4 и lxml, fuzzywuzzy) импортируются только в тех ветках обработчика, где они нужны.
 
 
-def say_day(day: Day) -> str:
+@cache
+def get_parser():
+    """
+    Импортирует и настраивает парсер при первом запросе расписания.
+    Если задана переменная окружения SSAU_SNAPSHOT_PATH, кэш заполняется из снимка (см. prefetch.py --snapshot).
+    """
+    from parser import SSAUParser
+
+    # Каждая загруженная неделя попадает в индекс для поиска преподавателей и в занятость аудиторий
+    SSAUParser.week_listeners.append(get_schedule_index())
+    SSAUParser.week_listeners.append(get_room_occupancy())
+
+    # Навыку Алисы нужно ответить за несколько секунд, поэтому долго ждать сайт не имеет смысла.
+    # Если сайт не успел ответить, просим повторить запрос, а загрузка тем временем завершится в фоне.
+    # Недавно просроченную неделю отдаём сразу и обновляем в фоне.
+    # Запросы к сайту ограничены SSAU_RATE_LIMIT в секунду, фоновые обновления уступают запросам пользователей.
+    SSAUParser.configure(connect_timeout=1, read_timeout=2, retries=1, backoff_factor=0.1,
+                         deadline=float(os.environ.get('SSAU_DEADLINE', 2.5)),
+                         stale_window=float(os.environ.get('SSAU_STALE_WINDOW', 24 * 60 * 60)),
+                         rate_limit=float(os.environ.get('SSAU_RATE_LIMIT', 10)), rate_burst=10)
+
+    if snapshot_path := os.environ.get('SSAU_SNAPSHOT_PATH'):
+        SSAUParser.load_snapshot(snapshot_path)
+    return SSAUParser
+
+
+@cache
+def get_schedule_index():
+    """Индекс занятий всех групп, расписание которых загружалось в этом процессе или есть в снимке"""
+    from schedule_index import ScheduleIndex
+    return ScheduleIndex()
+
+
+@cache
+def get_room_occupancy():
+    """Занятость аудиторий по тем же неделям, что и в индексе занятий"""
+    from occupancy import RoomOccupancy
+    return RoomOccupancy()
+
+
+@metrics.timed('say_day')
+def say_day(day: Day | DayView) -> str:
     response = f"Расписание на {day.date.strftime('%d.%m.%Y')}.\nИ так слушайте:\n"
     if len(day.pairs):
         if day.pairs[0].number != 1:
@@ -23,166 +67,305 @@ def say_day(day: Day) -> str:
     return response
 
 
-def parse_date_from_phrase(phrase: str) -> datetime.date:
-    today = datetime.date.today()
-
-    # Карта простых фраз на дни
-    days_map = {
-        "сегодня": 0,
-        "завтра": 1,
-        "послезавтра": 2,
-        "вчера": -1
-    }
+# Слова, обозначающие день относительно сегодняшнего
+DAY_WORDS = {
+    "сегодня": 0,
+    "завтра": 1,
+    "послезавтра": 2,
+    "вчера": -1
+}
+
+WEEKDAYS = {
+    "понедельник": 0,
+    "вторник": 1,
+    "среда": 2,
+    "четверг": 3,
+    "пятница": 4,
+    "суббота": 5,
+    "воскресенье": 6
+}
+
+MONTHS = {
+    "января": 1,
+    "февраля": 2,
+    "марта": 3,
+    "апреля": 4,
+    "мая": 5,
+    "июня": 6,
+    "июля": 7,
+    "августа": 8,
+    "сентября": 9,
+    "октября": 10,
+    "ноября": 11,
+    "декабря": 12
+}
+
+# Формы дней недели в разных падежах: "в среду", "к пятнице", "до понедельника"
+_WEEKDAY_FORMS = r'понедельник\w*|вторник\w*|сред[аеуы]|четверг\w*|пятниц[аеуы]|суббот[аеуы]|воскресень[еяю]'
+_UNITS = r'дн\w*|день|недел\w*|месяц\w*|год\w*|лет'
+
+# Все поддерживаемые виды фраз в одном выражении, фраза просматривается за один проход
+_DATE_PHRASE_RE = re.compile(rf"""
+    \b(?P<day_word>послезавтра|сегодня|завтра|вчера)\b
+  | \b(?P<weekday>{_WEEKDAY_FORMS})\b
+  | \b(?P<next_week>следующ\w*)
+  | \b(?P<past_week>был\w*)
+  | \b(?P<after>через\s*(?P<after_amount>\d+)\s*(?P<after_unit>{_UNITS}))\b
+  | \b(?P<ago>(?P<ago_amount>\d+)\s*(?P<ago_unit>{_UNITS})\s*назад)\b
+  | \b(?P<date>(?P<date_day>\d{{1,2}})\s*(?P<date_month>числ\w*|{'|'.join(MONTHS)}))\b
+""", re.VERBOSE)
+
+_PHRASE_KINDS = ('day_word', 'weekday', 'next_week', 'past_week', 'after', 'ago', 'date')
+
+# Первых четырёх букв достаточно, чтобы различить дни недели в любом падеже
+_WEEKDAY_BY_PREFIX = {name[:4]: weekday for name, weekday in WEEKDAYS.items()}
+
+
+def _weekday_date(today: datetime.date, weekday: int, next_week: bool, past_week: bool) -> datetime.date:
+    if past_week:
+        # Для прошедшего дня: ищем ближайший прошедший день
+        delta_days = (today.weekday() - weekday) % 7
+        if delta_days == 0:
+            delta_days = 7  # Если это сегодня, возвращаем предыдущую неделю
+        return today - datetime.timedelta(days=delta_days)
+
+    # Для будущего дня: ищем ближайший будущий день
+    delta_days = (weekday - today.weekday()) % 7
+    if next_week or delta_days == 0:
+        delta_days += 7
+    return today + datetime.timedelta(days=delta_days)
+
+
+def _shift_date(today: datetime.date, amount: int, unit: str) -> datetime.date:
+    """Сдвигает дату на amount дней, недель, месяцев или лет (amount может быть отрицательным)"""
+    if unit.startswith('д'):
+        return today + datetime.timedelta(days=amount)
+
+    if unit.startswith('н'):
+        return today + datetime.timedelta(weeks=amount)
+
+    months = amount if unit.startswith('м') else amount * 12
+    year, month = divmod(today.year * 12 + today.month - 1 + months, 12)
+    month += 1
+    day = min(today.day, calendar.monthrange(year, month)[1])  # Корректируем день для конца месяца
+    return datetime.date(year, month, day)
+
+
+@metrics.timed('parse_date')
+def parse_date_from_phrase(phrase: str, today: datetime.date = None) -> datetime.date:
+    today = today or datetime.date.today()
+
+    # Запоминаем первое вхождение каждого вида фраз
+    found = {}
+    for match in _DATE_PHRASE_RE.finditer(phrase):
+        kind = next(kind for kind in _PHRASE_KINDS if match.group(kind))
+        found.setdefault(kind, match)
 
     # Обрабатываем "сегодня", "завтра" и т.д.
-    for word, delta in days_map.items():
-        if word in phrase:
-            return today + datetime.timedelta(days=delta)
-
-    # Обрабатываем дни недели
-    weekdays_map = {
-        "понедельник": 0,
-        "вторник": 1,
-        "среда": 2,
-        "четверг": 3,
-        "пятница": 4,
-        "суббота": 5,
-        "воскресенье": 6
-    }
-
-    # Проверяем, говорится ли о следующей неделе
-    next_week = ("следующий" in phrase or "следующая" in phrase)
-
-    # Проверяем, упоминается ли прошедшая неделя ("что было")
-    past_week = ("что было" in phrase or "было" in phrase)
+    if match := found.get('day_word'):
+        return today + datetime.timedelta(days=DAY_WORDS[match.group('day_word')])
 
-    day, percent = process.extractOne(phrase, weekdays_map.keys())
-    if percent >= 70:
-        weekday = weekdays_map[day]
-        current_weekday = today.weekday()
-        if past_week:
-            # Для прошедшего дня: ищем ближайший прошедший день
-            delta_days = (current_weekday - weekday) % 7
-            if delta_days == 0:
-                delta_days = 7  # Если это сегодня, возвращаем предыдущую неделю
-            return today - datetime.timedelta(days=delta_days)
-
-        # Для будущего дня: ищем ближайший будущий день
-        delta_days = (weekday - current_weekday) % 7
-        if next_week or delta_days == 0:
-            delta_days += 7
-            return today + datetime.timedelta(days=delta_days)
+    # Обрабатываем дни недели, "следующий" указывает на следующую неделю, "было" - на прошедший день
+    if match := found.get('weekday'):
+        weekday = _WEEKDAY_BY_PREFIX[match.group('weekday')[:4]]
+        return _weekday_date(today, weekday, 'next_week' in found, 'past_week' in found)
 
     # Обрабатываем числовые даты типа "на 20 число" или "на 30 апреля"
-    day_match = re.search(
-        r'(\d{1,2})\s*(число|января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)',
-        phrase)
-
-    if day_match:
-        day = int(day_match.group(1))
-        month = today.month
-
-        # Определяем месяц по тексту
-        month_map = {
-            "января": 1,
-            "февраля": 2,
-            "марта": 3,
-            "апреля": 4,
-            "мая": 5,
-            "июня": 6,
-            "июля": 7,
-            "августа": 8,
-            "сентября": 9,
-            "октября": 10,
-            "ноября": 11,
-            "декабря": 12
-        }
-
-        for month_name, month_num in month_map.items():
-            if month_name in phrase:
-                month = month_num
-                break
-
-        # Проверяем, что если месяц прошел в этом году, используем следующий год
+    if match := found.get('date'):
+        day = int(match.group('date_day'))
+        if (month := MONTHS.get(match.group('date_month'))) is None:
+            # "20 число" - ближайшее 20 число: в этом месяце или, если оно уже прошло, в следующем
+            return _shift_date(today.replace(day=1), int(day < today.day), 'месяц').replace(day=day)
+
+        # Если дата в этом году уже прошла, используем следующий год
         year = today.year
         if month < today.month or (month == today.month and day < today.day):
             year += 1
+        return datetime.date(year, month, day)
+
+    # Обрабатываем фразы типа "через 3 дня", "через 2 недели", "через месяц" и т.п.
+    if match := found.get('after'):
+        return _shift_date(today, int(match.group('after_amount')), match.group('after_unit'))
+
+    # Обрабатываем фразы типа "3 дня назад", "2 недели назад" и т.п.
+    if match := found.get('ago'):
+        return _shift_date(today, -int(match.group('ago_amount')), match.group('ago_unit'))
 
-        # Возвращаем дату
-        return datetime.datetime(year, month, day)
-
-    # Обрабатываем фразы типа "через 3 дня" или "3 дня назад"
-    relative_days_match = re.search(r'через\s*(\d+)\s*(день|дня|дней)', phrase)
-    if relative_days_match:
-        days = int(relative_days_match.group(1))
-        return today + datetime.timedelta(days=days)
-
-    relative_days_ago_match = re.search(r'(\d+)\s*(день|дня|дней)\s*назад', phrase)
-    if relative_days_ago_match:
-        days = int(relative_days_ago_match.group(1))
-        return today - datetime.timedelta(days=days)
-
-    # Обрабатываем фразы "через X недель" или "X недель назад"
-    relative_weeks_match = re.search(r'через\s*(\d+)\s*(неделю|недели|недель)', phrase)
-    if relative_weeks_match:
-        weeks = int(relative_weeks_match.group(1))
-        return today + datetime.timedelta(weeks=weeks)
-
-    relative_weeks_ago_match = re.search(r'(\d+)\s*(неделю|недели|недель)\s*назад', phrase)
-    if relative_weeks_ago_match:
-        weeks = int(relative_weeks_ago_match.group(1))
-        return today - datetime.timedelta(weeks=weeks)
-
-    # Обрабатываем фразы "через X месяцев" или "X месяцев назад"
-    relative_months_match = re.search(r'через\s*(\d+)\s*(месяц|месяца|месяцев)', phrase)
-    if relative_months_match:
-        months = int(relative_months_match.group(1))
-        year = today.year + (today.month + months - 1) // 12
-        month = (today.month + months - 1) % 12 + 1
-        day = min(today.day, calendar.monthrange(year, month)[1])  # Корректируем день для конца месяца
-        return datetime.datetime(year, month, day)
-
-    relative_months_ago_match = re.search(r'(\d+)\s*(месяц|месяца|месяцев)\s*назад', phrase)
-    if relative_months_ago_match:
-        months = int(relative_months_ago_match.group(1))
-        year = today.year - (months // 12)
-        month = (today.month - months) % 12 or 12
-        if today.month - months <= 0:
-            year -= 1
-        day = min(today.day, calendar.monthrange(year, month)[1])  # Корректируем день для конца месяца
-        return datetime.datetime(year, month, day)
-
-    # Обрабатываем фразы "через X лет" или "X лет назад"
-    relative_years_match = re.search(r'через\s*(\d+)\s*(год|года|лет)', phrase)
-    if relative_years_match:
-        years = int(relative_years_match.group(1))
-        return datetime.datetime(today.year + years, today.month, today.day)
-
-    relative_years_ago_match = re.search(r'(\d+)\s*(год|года|лет)\s*назад', phrase)
-    if relative_years_ago_match:
-        years = int(relative_years_ago_match.group(1))
-        return datetime.datetime(today.year - years, today.month, today.day)
+    # Нечёткое сравнение с днями недели нужно только для фраз с опечатками, поэтому выполняется в последнюю очередь
+    from fuzzywuzzy import process
+
+    day, percent = process.extractOne(phrase, WEEKDAYS.keys())
+    if percent >= 70:
+        return _weekday_date(today, WEEKDAYS[day], 'next_week' in found, 'past_week' in found)
 
     # Если ничего не подошло, выбрасываем исключение
     raise ValueError("Невозможно определить дату из фразы.")
 
 
-def schedule_on_day(phrase: str, group_id: int) -> str:
+def schedule_on_day(phrase: str, group_id: int, subgroup: int = None) -> str:
     try:
         date_of_interest = parse_date_from_phrase(phrase)
-        return say_day(SSAUParser.get_day(group_id, date_of_interest))
+        day = get_parser().get_day(group_id, date_of_interest)
+        return say_day(DayView(day).subgroup(subgroup) if subgroup else day)
 
     except ValueError:
         return 'Не могу определить дату из вашего сообщения.'
 
-    except HTTPError as e:
-        return f'Извините сайт не отвечает, проверьте указанный вами id группы, попробуйте позже или, ' \
-               f'если проблема не исчезнет, свяжитесь с разработчиком. \n{e}'
-    except ConnectionError as e:
-        return f'Не удаётся установить соединение с сайтом. Попробуйте позже или свяжитесь с разработчиком. \n{e}'
+    except TimeoutError:
+        # Сайт не успел ответить за отведённое навыку время (DeadlineExceeded), загрузка продолжается в фоне
+        return 'Сайт с расписанием отвечает медленно. Спросите меня ещё раз через пару секунд.'
+
+    except OSError as e:
+        # Исключения requests наследуются от OSError. Сам requests к этому моменту уже загружен парсером
+        from requests import HTTPError, ConnectionError, Timeout
+
+        if isinstance(e, HTTPError):
+            return f'Извините сайт не отвечает, проверьте указанный вами id группы, попробуйте позже или, ' \
+                   f'если проблема не исчезнет, свяжитесь с разработчиком. \n{e}'
+        if isinstance(e, Timeout):
+            return f'Сайт с расписанием слишком долго не отвечает. Попробуйте позже. \n{e}'
+        if isinstance(e, ConnectionError):
+            return f'Не удаётся установить соединение с сайтом. Попробуйте позже или свяжитесь с разработчиком. \n{e}'
+        raise
+
+
+# "подгруппа 2", "моя подгруппа 1": номер подгруппы называется цифрой
+_SUBGROUP_RE = re.compile(r'\bподгрупп\w*\s*(?P<subgroup>\d)\b')
+
+# "где петров", "где сейчас преподаватель иванова", "где будет сидоров завтра".
+# Без слова "преподаватель" фраза считается вопросом о преподавателе, только если такой есть в индексе:
+# "где у меня пары завтра" или "где первая пара" - вопросы о своём расписании
+_WHERE_TEACHER_RE = re.compile(
+    r'\bгде\s+(?:(?:сейчас|будет|был\w*|находится)\s+)*(?P<marker>преподавател\w*\s+)?(?P<teacher>[а-яё]+)'
+)
+
+
+def _find_teacher_question(phrase: str) -> str | None:
+    """Вернёт слово из имени преподавателя, если фраза - вопрос о том, где он"""
+    if not (match := _WHERE_TEACHER_RE.search(phrase)):
+        return None
+    if match.group('marker'):
+        return match.group('teacher')
+
+    get_parser()  # Индекс заполняется из снимка при настройке парсера
+    return match.group('teacher') if get_schedule_index().has_teacher(match.group('teacher')) else None
+
+
+def _mentioned_date(phrase: str) -> datetime.date | None:
+    """Дата из фразы или None, если дата во фразе не названа (ValueError, если названа, но неразборчиво)"""
+    # "следующий" и "был" без дня не указывают дату
+    if any(not (match.group('next_week') or match.group('past_week')) for match in _DATE_PHRASE_RE.finditer(phrase)):
+        return parse_date_from_phrase(phrase)
+    return None
+
+
+def where_is_teacher(phrase: str, teacher: str) -> str:
+    """
+    Ищет пары преподавателя в индексе. Без даты во фразе отвечает, где преподаватель сейчас или где будет
+    на ближайшей паре сегодня, с датой - перечисляет все его пары в этот день.
+    """
+    get_parser()  # Индекс заполняется из снимка при настройке парсера
+
+    try:
+        date = _mentioned_date(phrase)
+    except ValueError:
+        return 'Не могу определить дату из вашего сообщения.'
+    has_date = date is not None
+    date = date or datetime.date.today()
+
+    lessons = get_schedule_index().find(teacher=teacher, date=date)
+    if not lessons:
+        return f"Не нашла пар преподавателя {teacher.capitalize()} на {date.strftime('%d.%m.%Y')}. " \
+               f"Я знаю расписание только тех групп, о которых меня уже спрашивали."
+
+    if not has_date:
+        now = datetime.datetime.now().time()
+        upcoming = [lesson for lesson in lessons if PairsSet.TIMES[lesson.number][1] >= now]
+        if not upcoming:
+            return f'Сегодня у преподавателя {teacher.capitalize()} пар больше нет.'
+        lesson = upcoming[0]
+        when = 'Сейчас' if PairsSet.TIMES[lesson.number][0] <= now else 'На ближайшей паре'
+        return f'{when} {lesson.pair.teacher}: пара номер {lesson.number}, {lesson.pair.discipline_name}, ' \
+               f'место: {lesson.pair.place}'
+
+    response = f"Пары преподавателя {lessons[0].pair.teacher} на {date.strftime('%d.%m.%Y')}:\n"
+    for lesson in lessons:
+        response += f'№{lesson.number} - {lesson.pair.discipline_name}, место: {lesson.pair.place}\n'
+    return response
+
+
+# "свободные аудитории", "какие аудитории свободны завтра на 3 паре в 5 корпусе"
+_FREE_ROOMS_RE = re.compile(r'\bсвободн\w*\s+(?:\w+\s+)?аудитори\w*|\bаудитори\w*\s+(?:\w+\s+)?свободн\w*')
+_PAIR_NUMBER_RE = re.compile(
+    r'\b(?:(?P<digit>[1-6])(?:\s*-?\s*[а-я]{1,3})?|(?P<word>перв|втор|трет|четв[её]рт|пят|шест)\w*)\s+пар\w*'
+)
+_PAIR_NUMBER_WORDS = {'перв': 1, 'втор': 2, 'трет': 3, 'четв': 4, 'пят': 5, 'шест': 6}
+_BUILDING_RE = re.compile(r'\b(?P<before>\d+)(?:\s*-?\s*[а-я]{1,3})?\s+корпус\w*|\bкорпус\w*\s+(?:№\s*)?(?P<after>\d+)')
+# Сколько аудиторий называть вслух
+_MAX_ROOMS = 10
+
+
+def free_rooms(phrase: str) -> str:
+    """
+    Свободные аудитории на паре, названной во фразе (по умолчанию - текущей или ближайшей сегодня).
+    Аудитории и их занятость известны только по загруженным неделям групп.
+    """
+    get_parser()  # Занятость аудиторий заполняется из снимка при настройке парсера
+
+    building = None
+    if match := _BUILDING_RE.search(phrase):
+        building = match.group('before') or match.group('after')
+        phrase = phrase[:match.start()] + phrase[match.end():]
+
+    number = None
+    if match := _PAIR_NUMBER_RE.search(phrase):
+        number = int(match.group('digit') or _PAIR_NUMBER_WORDS[match.group('word')[:4]])
+        phrase = phrase[:match.start()] + phrase[match.end():]
+
+    try:
+        date = _mentioned_date(phrase) or datetime.date.today()
+    except ValueError:
+        return 'Не могу определить дату из вашего сообщения.'
+
+    if number is None:
+        if date != datetime.date.today():
+            number = 1
+        else:
+            now = datetime.datetime.now().time()
+            if (number := next((n for n, (_, end) in PairsSet.TIMES.items() if end >= now), None)) is None:
+                return 'Сегодня пары уже закончились, свободны все аудитории.'
+
+    occupancy = get_room_occupancy()
+    where = f' в {building} корпусе' if building else ''
+    when = f"на {number} паре {date.strftime('%d.%m.%Y')}"
+    if not occupancy.knows_date(date):
+        return f'Не знаю, какие аудитории свободны {when}. ' \
+               f'Я знаю расписание только тех групп, о которых меня уже спрашивали.'
+
+    rooms = occupancy.free_rooms(date, number, building=building)
+    if not rooms:
+        return f'Не нашла свободных аудиторий{where} {when}.'
+
+    response = f"Свободные аудитории{where} {when}: {', '.join(rooms[:_MAX_ROOMS])}"
+    if len(rooms) > _MAX_ROOMS:
+        response += f' и ещё {len(rooms) - _MAX_ROOMS}'
+    return response
 
 
 def handler(event: dict, context) -> dict:
+    """
+    Точка входа навыка. Запрос профилируется через cProfile (см. metrics.profile),
+    если в нём есть поле "profile": true или задана переменная окружения SSAU_PROFILE.
+    """
+    if event.get('profile') or os.environ.get('SSAU_PROFILE'):
+        with metrics.profile('handler'):
+            return _handle(event)
+
+    with metrics.span('handler'):
+        return _handle(event)
+
+
+def _handle(event: dict) -> dict:
     # TODO: Добавить логику сохранения id группы в хранилище приложения
     user_state_update = {}
     end_session = 'false'
@@ -204,12 +387,22 @@ def handler(event: dict, context) -> dict:
         user_state_update['group_id'] = int(phrase)
         text = 'Вы успешно сменили id своей группы.'
 
+    elif match := _SUBGROUP_RE.search(phrase):
+        user_state_update['subgroup'] = int(match.group('subgroup'))
+        text = f"Теперь я буду называть только пары {match.group('subgroup')} подгруппы и пары всей группы."
+
+    elif _FREE_ROOMS_RE.search(phrase):
+        text = free_rooms(phrase)
+
+    elif teacher := _find_teacher_question(phrase):
+        text = where_is_teacher(phrase, teacher)
+
     elif 'group_id' not in event['state']['user']:
         text = 'Напиши мне id своей группы.'
 
     else:
         group_id = event['state']['user']['group_id']
-        text = schedule_on_day(phrase, group_id)
+        text = schedule_on_day(phrase, group_id, event['state']['user'].get('subgroup'))
 
     return {
         'version': event['version'],
@@ -0,0 +1,129 @@
+"""
+Альтернативный парсер страницы расписания, работающий напрямую с деревом lxml.
+Вся неделя собирается за один проход по элементам страницы с заранее скомпилированными XPath выражениями,
+без построения дерева BeautifulSoup. Результат совпадает с SSAUParser._create_week.
+"""
+import datetime
+import re
+
+from lxml import etree, html as lxml_html
+
+import metrics
+from schedule import PairsSet, Week, Day, LazyDays, Pair
+
+
+def _has_class(name: str) -> str:
+    """Условие XPath: элемент содержит класс name (аналог class_='name' в BeautifulSoup)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _class_is(value: str) -> str:
+    """Условие XPath: атрибут class в точности равен value (аналог class_='a b' в BeautifulSoup)"""
+    return f"normalize-space(@class) = '{value}'"
+
+
+# Все ячейки сетки (заголовки дней и пары) и ячейки времени в порядке следования в документе
+_GRID = etree.XPath(f"//div[{_has_class('schedule__item')} or {_has_class('schedule__time')}]")
+
+_HEAD_DATE = etree.XPath(f".//div[{_class_is('caption-text schedule__head-date')}][1]")
+_TIME_ITEMS = etree.XPath(f".//div[{_has_class('schedule__time-item')}]")
+
+_LESSONS = etree.XPath(f".//div[{_has_class('schedule__lesson')}]")
+_LESSON_TYPES = etree.XPath(".//div[starts-with(normalize-space(@class), 'schedule__lesson-type-color ')]/@class")
+_DISCIPLINE = etree.XPath(f".//div[{_class_is('body-text schedule__discipline')}][1]")
+_PLACE = etree.XPath(f".//div[{_class_is('caption-text schedule__place')}][1]")
+_TEACHER = etree.XPath(f".//div[{_has_class('schedule__teacher')}][1]")
+_GROUPS = etree.XPath(f"(.//div[{_has_class('schedule__groups')}])[1]//*[{_has_class('caption-text')}]")
+_TEXT = etree.XPath("string()")
+
+_LESSON_TYPE_RE = re.compile(r'^schedule__lesson-type-color lesson-type-(\d+)__color$')
+_NUMBER_RE = re.compile(r'\d+')
+
+_HEAD_CLASS = 'schedule__item schedule__head'
+_AMOUNT_HEADER_ITEMS = 7
+
+
+def _text(elements: list) -> str:
+    return _TEXT(elements[0]).strip() if elements else ''
+
+
+def _parse_time(element) -> datetime.time:
+    hour, minute = _TEXT(element).strip().split(':')
+    return datetime.time(int(hour), int(minute))
+
+
+def _parse_pair_type(lesson) -> int | None:
+    found = set()
+    for class_value in _LESSON_TYPES(lesson):
+        if match := _LESSON_TYPE_RE.match(' '.join(class_value.split())):
+            found.add(int(match.group(1)))
+
+    # Как и в SSAUParser._get_pair_type, при нескольких совпадениях побеждает тип, стоящий раньше в PAIR_TYPES
+    return next((pair_type for pair_type in Pair.PAIR_TYPES if pair_type in found), None)
+
+
+def _parse_pair(lesson) -> Pair:
+    groups, subgroups = set(), set()
+    for group in _GROUPS(lesson):
+        if not (g_text := _TEXT(group).strip().lower()):
+            continue
+
+        if 'подгруппы' in g_text:
+            subgroups.add(int(_NUMBER_RE.search(g_text).group(0)))
+        else:
+            groups.add(g_text)
+
+    return Pair(_text(_DISCIPLINE(lesson)), _text(_TEACHER(lesson)), _text(_PLACE(lesson)),
+                _parse_pair_type(lesson), groups, subgroups)
+
+
+def _scan_grid(html: str | bytes) -> tuple[list[datetime.date], list[tuple[datetime.time, datetime.time]], list]:
+    """Один проход по странице: даты дней, время пар и ячейки сетки (по строкам, в строке - по дням)"""
+    root = lxml_html.document_fromstring(html)
+
+    dates, times, cells = [], [], []
+    amount_items = 0
+    for element in _GRID(root):
+        classes = element.get('class', '').split()
+        if 'schedule__time' in classes:
+            start_time_item, end_time_item = _TIME_ITEMS(element)
+            times.append((_parse_time(start_time_item), _parse_time(end_time_item)))
+        if 'schedule__item' not in classes:
+            continue
+
+        if ' '.join(classes) == _HEAD_CLASS and (date_element := _HEAD_DATE(element)):
+            day, month, year = map(int, _TEXT(date_element[0]).strip().split('.'))
+            dates.append(datetime.date(year, month, day))
+
+        if amount_items >= _AMOUNT_HEADER_ITEMS:
+            cells.append(element)
+        amount_items += 1
+
+    return dates, times, cells
+
+
+@metrics.timed('parse_day')
+def _create_day(dates: list[datetime.date], times: list, cells: list, index: int) -> Day:
+    """Разбирает только столбец index сетки"""
+    day = Day(dates[index], [
+        PairsSet(PairsSet.define_pair_number_by_time(time),
+                 [_parse_pair(lesson) for lesson in _LESSONS(cells[row * len(dates) + index])])
+        for row, time in enumerate(times)
+    ])
+    day.strip_day()
+    return day
+
+
+def create_week(html: str | bytes, number_week: int) -> Week:
+    """Разбирает HTML страницы расписания и возвращает неделю"""
+    dates, times, cells = _scan_grid(html)
+    return Week(number_week, [_create_day(dates, times, cells, i) for i in range(len(dates))])
+
+
+def create_lazy_week(html: str | bytes, number_week: int) -> Week:
+    """
+    Неделя, в которой разобраны только даты и время, а пары каждого дня разбираются при первом обращении к нему
+    (см. schedule.LazyDays). Дни создаются уже неизменяемыми.
+    """
+    dates, times, cells = _scan_grid(html)
+    return Week(number_week, LazyDays(len(dates), lambda i: _create_day(dates, times, cells, i).freeze()))
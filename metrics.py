@@ -0,0 +1,173 @@
+"""
+Метрики горячего пути: длительность этапов (загрузка страницы, разбор, разбор фразы, ответ, генерация ICS)
+и счётчики попаданий в кэш. Выгружаются в текстовом формате Prometheus (render_prometheus),
+а при заданной переменной окружения SSAU_METRICS_LOG каждый этап дополнительно пишется в лог одной JSON строкой.
+
+    with metrics.span('fetch'):
+        ...
+
+    @metrics.timed('say_day')
+    def say_day(day): ...
+"""
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограммы длительностей в секундах
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+STAGE_SECONDS = 'ssau_stage_seconds'
+CACHE_REQUESTS = 'ssau_cache_requests_total'
+
+LOG_SPANS = bool(os.environ.get('SSAU_METRICS_LOG'))
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Registry:
+    """Счётчики и гистограммы процесса. Метрика задаётся именем и набором меток"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (histogram := self._histograms.get(key)) is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Измеряет длительность этапа, в том числе завершившегося исключением"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(STAGE_SECONDS, elapsed, stage=stage)
+            if LOG_SPANS:
+                _log_span(stage, elapsed)
+
+    def timed(self, stage: str):
+        """Декоратор: каждый вызов функции - этап stage"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        """Текущие значения: счётчики и для гистограмм количество и сумма"""
+        with self._lock:
+            return {
+                'counters': {_format_name(name, labels): value for (name, labels), value in self._counters.items()},
+                'histograms': {_format_name(name, labels): {'count': histogram.count, 'sum': histogram.sum}
+                               for (name, labels), histogram in self._histograms.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f'# TYPE {name} counter')
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f'{_format_name(name, labels)} {value:g}')
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f'# TYPE {name} histogram')
+                for (histogram_name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{_format_name(name + '_bucket', labels + (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{_format_name(name + '_bucket', labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{_format_name(name + '_sum', labels)} {histogram.sum:.6f}")
+                    lines.append(f"{_format_name(name + '_count', labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _format_name(name: str, labels: Labels) -> str:
+    if not labels:
+        return name
+    values = ','.join(f'{key}="{value}"' for key, value in labels)
+    return f'{name}{{{values}}}'
+
+
+def _log_span(stage: str, elapsed: float):
+    import json
+    import logging
+
+    logging.getLogger(__name__).info(json.dumps({'stage': stage, 'ms': round(elapsed * 1000, 3)}))
+
+
+@contextmanager
+def profile(name: str = 'request'):
+    """
+    Профилирует блок через cProfile и пишет в лог 30 самых затратных функций.
+    Если задана переменная окружения SSAU_PROFILE_DIR, полная статистика сохраняется туда в файл .prof
+    (его можно открыть, например, в snakeviz).
+    """
+    import cProfile
+    import io
+    import logging
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if directory := os.environ.get('SSAU_PROFILE_DIR'):
+            profiler.dump_stats(os.path.join(directory, f'{name}-{time.time_ns()}.prof'))
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+        logging.getLogger(__name__).info('Профиль %s:\n%s', name, stream.getvalue())
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+span = registry.span
+timed = registry.timed
+render_prometheus = registry.render_prometheus
@@ -0,0 +1,129 @@
+"""
+Занятость аудиторий в виде битовых масок для поиска свободных аудиторий.
+Каждой аудитории, встреченной в загруженных неделях, присваивается номер бита,
+а для каждой пары (дата, номер пары) хранится целое число с установленными битами занятых аудиторий.
+Поэтому вопрос "какие аудитории 3 корпуса свободны на 4 паре" - это одна операция
+`маска корпуса & ~занятые`, а "свободны три пары подряд" - ещё два побитовых ИЛИ, без перебора недель.
+"""
+import datetime
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import Iterable
+
+from schedule import PairsSet, Week
+from schedule_index import normalize, place_building
+
+Slot = tuple[datetime.date, int]
+
+
+class RoomOccupancy:
+    """
+    Занятость аудиторий по неделям всех групп. Как и ScheduleIndex, подписывается на загрузку недель
+    через SSAUParser.week_listeners. Вклад каждой недели группы хранится отдельно, поэтому при её обновлении
+    маски пересчитываются только для затронутых пар.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Номер бита -> название аудитории и ключ аудитории (см. schedule_index.normalize) -> номер бита
+        self._rooms: list[str] = []
+        self._room_bits: dict[str, int] = {}
+        # Корпус -> маска его аудиторий и маска всех известных аудиторий
+        self._buildings: defaultdict[str, int] = defaultdict(int)
+        self._all_rooms = 0
+        # (группа, неделя) -> пара -> занятые аудитории
+        self._sources: dict[tuple[int, int], dict[Slot, int]] = {}
+        # Пара -> (группа, неделя) -> занятые аудитории и итоговая маска занятых аудиторий для пары
+        self._slot_sources: defaultdict[Slot, dict[tuple[int, int], int]] = defaultdict(dict)
+        self._occupied: dict[Slot, int] = {}
+
+    def __call__(self, group_id: int, week: Week):
+        self.update(group_id, week)
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def _room_bit(self, place: str) -> int:
+        key = normalize('place', place)
+        if (bit := self._room_bits.get(key)) is None:
+            bit = self._room_bits[key] = len(self._rooms)
+            self._rooms.append(place)
+            self._all_rooms |= 1 << bit
+            if (building := place_building(place)) is not None:
+                self._buildings[building] |= 1 << bit
+        return bit
+
+    def update(self, group_id: int, week: Week):
+        """Заменяет занятость аудиторий по неделе группы"""
+        source = (group_id, week.number_week)
+        with self._lock:
+            slots: defaultdict[Slot, int] = defaultdict(int)
+            for day in week.days:
+                for pairs_set in day.pairs:
+                    for pair in pairs_set:
+                        if pair.place:
+                            slots[(day.date, pairs_set.number)] |= 1 << self._room_bit(pair.place)
+
+            old_slots = self._sources.get(source, {})
+            if old_slots == slots:
+                return
+            self._sources[source] = dict(slots)
+
+            for slot in old_slots.keys() | slots.keys():
+                sources = self._slot_sources[slot]
+                old_mask = sources.pop(source, 0)
+                if mask := slots.get(slot, 0):
+                    sources[source] = mask
+
+                if not sources:
+                    del self._slot_sources[slot]
+                    self._occupied.pop(slot, None)
+                elif old_mask & ~mask:
+                    # Какие-то аудитории освободились, но они могут быть заняты другими группами
+                    self._occupied[slot] = reduce(or_, sources.values())
+                else:
+                    self._occupied[slot] = self._occupied.get(slot, 0) | mask
+
+    def _decode(self, mask: int) -> list[str]:
+        """Названия аудиторий, биты которых установлены в маске"""
+        rooms = []
+        while mask:
+            low_bit = mask & -mask
+            rooms.append(self._rooms[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return sorted(rooms)
+
+    def _free_mask(self, date: datetime.date, number: int, count: int, building: str | None) -> int:
+        rooms = self._buildings.get(building, 0) if building is not None else self._all_rooms
+        occupied = 0
+        for slot_number in range(number, number + count):
+            occupied |= self._occupied.get((date, slot_number), 0)
+        return rooms & ~occupied
+
+    def free_rooms(self, date: datetime.date, number: int, count: int = 1, building: str = None) -> list[str]:
+        """
+        Аудитории, свободные в указанный день с пары number и ещё count - 1 пар подряд.
+        building - номер корпуса, как он записан в названии аудитории ("3" для "412 - 3 корп.").
+        Известны только аудитории, встречавшиеся в загруженных неделях.
+        """
+        if number + count - 1 not in PairsSet.TIMES:
+            return []
+        with self._lock:
+            return self._decode(self._free_mask(date, number, count, building))
+
+    def free_numbers(self, place: str, date: datetime.date, numbers: Iterable[int] = PairsSet.TIMES) -> list[int]:
+        """Номера пар, на которых аудитория свободна в указанный день"""
+        with self._lock:
+            if (bit := self._room_bits.get(normalize('place', place))) is None:
+                return []
+            return [number for number in numbers if not self._occupied.get((date, number), 0) >> bit & 1]
+
+    def knows_date(self, date: datetime.date) -> bool:
+        """Есть ли в загруженных неделях занятия в этот день. Если нет, о свободных аудиториях судить нельзя"""
+        with self._lock:
+            return any((date, number) in self._occupied for number in PairsSet.TIMES)
+
+    def is_free(self, place: str, date: datetime.date, number: int) -> bool:
+        return number in self.free_numbers(place, date, range(number, number + 1))
@@ -2,14 +2,82 @@
 Выполняет парсинг расписания на неделю для указанной группы
 Также есть функция для парсинга начала семестра определённой группы
 """
+import asyncio
+import contextvars
+import dataclasses
 import datetime
 import re
-from functools import lru_cache
-
-import requests
-from bs4 import BeautifulSoup
-
-from schedule import PairsSet, Week, Day, Pair
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Iterable, TYPE_CHECKING
+
+import metrics
+from cache import CacheEntry, ScheduleCache, create_default_cache, load_snapshot, save_snapshot
+from ratelimit import Priority, PriorityTokenBucket, upstream_priority
+from schedule import PairsSet, Week, Day, LazyDays, Pair
+from singleflight import SingleFlight, AsyncSingleFlight
+
+# requests, bs4 и lxml импортируются при первом обращении к ним: навык работает в serverless функции,
+# и на холодном старте не нужно загружать их для ответов, не требующих сайта или кэша
+if TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    """Настройки соединения с сайтом расписания"""
+    # Количество соединений, которые держатся открытыми (keep-alive) для повторного использования
+    pool_size: int = 10
+    # Таймауты установки соединения и чтения ответа в секундах
+    connect_timeout: float = 3.05
+    read_timeout: float = 10
+    # Количество повторов при ошибках соединения и ответах 5xx,
+    # пауза перед i-м повтором равна backoff_factor * 2 ** (i - 1) секунд
+    retries: int = 3
+    backoff_factor: float = 0.3
+    # Сколько секунд get_day ждёт сайт, прежде чем выбросить DeadlineExceeded (None - без ограничения)
+    deadline: float = None
+    # Сколько секунд после истечения CACHE_TTL неделю из кэша ещё можно отдать сразу, обновляя её в фоне
+    stale_window: float = 0
+    # Не больше rate_limit запросов к сайту в секунду (None - без ограничения) с запасом в rate_burst запросов,
+    # повторы (retries) учитываются как отдельные запросы.
+    # Интерактивные запросы обслуживаются раньше фоновых (см. ratelimit)
+    rate_limit: float = None
+    rate_burst: int = 5
+
+
+class DeadlineExceeded(TimeoutError):
+    """Сайт не ответил за отведённое время, а подходящей недели в кэше нет"""
+
+
+@dataclass(frozen=True)
+class SemesterCalendar:
+    """
+    Нумерация недель семестра группы по дате начала семестра со страницы расписания.
+    Первая неделя - та, в которую попадает начало семестра.
+    """
+    start: datetime.date
+    expires_at: float
+
+    # Сколько недель после начала семестра нумеруются от него, дальше календарь уже не применяется
+    WEEKS = 26
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def first_monday(self) -> datetime.date:
+        return self.start - datetime.timedelta(days=self.start.weekday())
+
+    def covers(self, date: datetime.date) -> bool:
+        return 0 <= (date - self.first_monday).days < self.WEEKS * 7
+
+    def number_week(self, date: datetime.date) -> int:
+        return (date - self.first_monday).days // 7 + 1
 
 
 class SSAUParser:
@@ -22,22 +90,177 @@ class SSAUParser:
                       'Yowser/2.5 Safari/537.36'
     }
 
+    settings = HttpSettings()
+    _session: 'requests.Session' = None
+    _session_lock = threading.Lock()
+    _limiter: PriorityTokenBucket = None
+
+    # Максимальное количество одновременных запросов при загрузке нескольких недель
+    MAX_WORKERS = 6
+
+    # Парсер страницы: 'bs4' - разбор через BeautifulSoup, 'lxml' - быстрый однопроходный разбор (см. lxml_parser)
+    backend = 'bs4'
+
+    # Кэш страниц расписания и время (в секундах), в течение которого страница считается актуальной
+    cache: ScheduleCache = create_default_cache()
+    CACHE_TTL = 60 * 60
+
+    # Объединение одновременных запросов одной и той же недели, в stats - счётчики объединённых вызовов
+    flight = SingleFlight()
+    async_flight = AsyncSingleFlight()
+
+    # Календари семестров групп (см. get_semester_calendar) и время (в секундах), в течение которого они актуальны
+    _calendars: dict[int, SemesterCalendar] = {}
+    SEMESTER_TTL = 24 * 60 * 60
+
+    # Функции (group_id, week), вызываемые после загрузки или обновления недели, например ScheduleIndex
+    week_listeners: list[Callable[[int, Week], None]] = []
+
+    # Потоки для фоновой работы (обновление кэша, слушатели недель) и отдельно для загрузок
+    # с ограничением по времени, чтобы запрос пользователя не ждал в очереди за фоновыми задачами
+    _executor: ThreadPoolExecutor = None
+    _foreground_executor: ThreadPoolExecutor = None
+    _refreshing: set[str] = set()
+    _refreshing_lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, **settings):
+        """
+        Меняет настройки соединения, например SSAUParser.configure(read_timeout=2, retries=1).
+        Настройки можно задать отдельно для наследника SSAUParser, тогда у него будет своя сессия.
+        """
+        with cls._session_lock:
+            cls.settings = dataclasses.replace(cls.settings, **settings)
+            if session := cls.__dict__.get('_session'):
+                session.close()
+            cls._session = None
+            cls._limiter = None
+
     @classmethod
-    def _get_soup(cls, group_id: int, selected_week: int = None) -> BeautifulSoup:
+    def _get_session(cls) -> 'requests.Session':
+        """Вернёт общую для класса сессию с пулом соединений, создав её при первом обращении"""
+        if (session := cls.__dict__.get('_session')) is not None:
+            return session
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        class LimitedRetry(Retry):
+            """Повтор запроса тоже берёт токен ограничителя частоты, иначе при ошибках сайта запросов в разы больше"""
+
+            def sleep(self, response=None):
+                super().sleep(response)
+                if (limiter := cls._get_limiter()) is not None:
+                    limiter.acquire()
+
+        with cls._session_lock:
+            if (session := cls.__dict__.get('_session')) is not None:
+                return session
+
+            retry = LimitedRetry(total=cls.settings.retries,
+                                 backoff_factor=cls.settings.backoff_factor,
+                                 status_forcelist=(500, 502, 503, 504),
+                                 allowed_methods=frozenset({'GET'}),
+                                 raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=cls.settings.pool_size,
+                                  pool_maxsize=cls.settings.pool_size,
+                                  max_retries=retry)
+            session = requests.Session()
+            session.headers.update(cls._HEADERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            cls._session = session
+            return session
+
+    @classmethod
+    def _get_limiter(cls) -> PriorityTokenBucket | None:
+        """Вернёт общий для класса ограничитель частоты запросов или None, если ограничение не задано"""
+        if cls.settings.rate_limit is None:
+            return None
+
+        with cls._session_lock:
+            if (limiter := cls.__dict__.get('_limiter')) is None:
+                limiter = cls._limiter = PriorityTokenBucket(cls.settings.rate_limit, cls.settings.rate_burst)
+            return limiter
+
+    @staticmethod
+    def _cache_key(group_id: int, selected_week: int = None) -> str:
+        return f"{group_id}:{selected_week or ''}"
+
+    @classmethod
+    def _get_page(cls, group_id: int, selected_week: int = None) -> CacheEntry:
+        """
+        Вернёт страницу расписания из кэша, если она ещё актуальна.
+        Иначе загрузит её с сайта, а при наличии просроченной записи
+        попросит сервер подтвердить, что страница не изменилась (ETag/Last-Modified).
+        """
+        key = cls._cache_key(group_id, selected_week)
+        entry = cls.cache.get(key)
+        if entry is not None and entry.fresh:
+            metrics.inc(metrics.CACHE_REQUESTS, result='hit')
+            return entry
 
         url = f"{cls._URL}?groupId={group_id}"
 
         if selected_week:
             url += f"&selectedWeek={selected_week}"
 
-        response = requests.get(url, headers=cls._HEADERS)
-        if response.status_code != 200:
-            raise requests.exceptions.HTTPError(f'Server returned {response.status_code} status code.')
-        soup = BeautifulSoup(response.text, 'lxml')
-        return soup
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        if (limiter := cls._get_limiter()) is not None:
+            limiter.acquire()
+
+        with metrics.span('fetch'):
+            response = cls._get_session().get(url, headers=headers,
+                                              timeout=(cls.settings.connect_timeout, cls.settings.read_timeout))
+        if response.status_code == 304 and entry is not None:
+            # Страница не изменилась: сохраняем и HTML, и уже разобранную неделю
+            metrics.inc(metrics.CACHE_REQUESTS, result='revalidated')
+            entry.expires_at = time.time() + cls.CACHE_TTL
+            if entry.semester_start is None:
+                entry.semester_start = cls._parse_start_semester(entry.html)
+        elif response.status_code == 200:
+            metrics.inc(metrics.CACHE_REQUESTS, result='miss')
+            entry = CacheEntry(response.text,
+                               etag=response.headers.get('ETag'),
+                               last_modified=response.headers.get('Last-Modified'),
+                               expires_at=time.time() + cls.CACHE_TTL,
+                               semester_start=cls._parse_start_semester(response.text))
+            if selected_week is None:
+                cls._share_current_week(group_id, entry)
+        else:
+            from requests import HTTPError
+            raise HTTPError(f'Server returned {response.status_code} status code.')
+
+        # Любая загруженная или подтверждённая страница группы заодно обновляет её календарь семестра
+        cls._remember_calendar(group_id, entry)
+        cls.cache.set(key, entry)
+        return entry
+
+    _NUMBER_WEEK_RE = re.compile(r'week-nav-current_week[^>]*>\s*(\d+)')
+
+    @classmethod
+    def _share_current_week(cls, group_id: int, entry: CacheEntry):
+        """
+        Страница без selectedWeek - это страница текущей недели, её номер указан в навигации по неделям.
+        Запись кладётся в кэш и под ключом этой недели, чтобы get_day после загрузки календаря
+        не запрашивал ту же страницу второй раз.
+        """
+        if (match := cls._NUMBER_WEEK_RE.search(entry.html)) is None:
+            return
+        key = cls._cache_key(group_id, int(match.group(1)))
+        current = cls.cache.get(key)
+        if current is None or not current.fresh:
+            cls.cache.set(key, entry)
 
     @staticmethod
-    def _parse_times(soup: BeautifulSoup) -> list[tuple[datetime.time, datetime.time]]:
+    def _parse_times(soup: 'BeautifulSoup') -> list[tuple[datetime.time, datetime.time]]:
         def create_time_from_item(item) -> datetime.time:
             """Принимает ячейку времени с текстом в формате ` 8:00 ` преобразует в класс datetime.time"""
             text = item.text.strip()
@@ -52,7 +275,7 @@ class SSAUParser:
         return times
 
     @staticmethod
-    def _parse_dates(soup: BeautifulSoup) -> list[datetime.date]:
+    def _parse_dates(soup: 'BeautifulSoup') -> list[datetime.date]:
         dates = []
 
         for schedule_date in soup.find_all("div", class_="schedule__item schedule__head"):
@@ -63,7 +286,7 @@ class SSAUParser:
         return dates
 
     @staticmethod
-    def _get_pair_type(pair: BeautifulSoup):
+    def _get_pair_type(pair: 'BeautifulSoup'):
         for pair_type in Pair.PAIR_TYPES:
             class_pair_type = f"schedule__lesson-type-color lesson-type-{pair_type}__color"
             if pair.find("div", class_=class_pair_type):
@@ -97,7 +320,7 @@ class SSAUParser:
         return groups, subgroups
 
     @classmethod
-    def _parse_pairs_set(cls, soup_item: BeautifulSoup, time: tuple[datetime.time, datetime.time]) -> PairsSet:
+    def _parse_pairs_set(cls, soup_item: 'BeautifulSoup', time: tuple[datetime.time, datetime.time]) -> PairsSet:
         pairs_set = []
         for pair in soup_item.find_all("div", class_="schedule__lesson"):
 
@@ -112,27 +335,98 @@ class SSAUParser:
         return PairsSet(PairsSet.define_pair_number_by_time(time), pairs_set)
 
     @classmethod
-    def _create_week(cls, soup: BeautifulSoup, number_week: int) -> Week:
-        days = [Day(date) for date in cls._parse_dates(soup)]
-
+    def _scan_grid(cls, soup: 'BeautifulSoup') -> tuple[list[datetime.date], list, list['BeautifulSoup']]:
+        """Даты дней, время пар и ячейки сетки (по строкам, в строке - по дням)"""
         amount_header_items = 7
-        item_iter = iter(soup.find_all("div", class_="schedule__item")[amount_header_items:])
+        cells = soup.find_all("div", class_="schedule__item")[amount_header_items:]
+        return cls._parse_dates(soup), cls._parse_times(soup), cells
 
-        for time in cls._parse_times(soup):
-            for day in days:
-                day.pairs.append(cls._parse_pairs_set(next(item_iter), time))
+    @classmethod
+    @metrics.timed('parse_day')
+    def _create_day(cls, dates: list[datetime.date], times: list, cells: list['BeautifulSoup'], index: int) -> Day:
+        """Разбирает только столбец index сетки"""
+        day = Day(dates[index], [cls._parse_pairs_set(cells[row * len(dates) + index], time)
+                                 for row, time in enumerate(times)])
+        day.strip_day()
+        return day
 
-        for day in days:
-            day.strip_day()
+    @classmethod
+    @metrics.timed('create_week')
+    def _create_week(cls, soup: 'BeautifulSoup', number_week: int) -> Week:
+        dates, times, cells = cls._scan_grid(soup)
+        return Week(number_week, [cls._create_day(dates, times, cells, i) for i in range(len(dates))])
 
-        return Week(number_week, days)
+    @classmethod
+    def _create_lazy_week(cls, soup: 'BeautifulSoup', number_week: int) -> Week:
+        """Неделя, дни которой разбираются при первом обращении (см. schedule.LazyDays)"""
+        dates, times, cells = cls._scan_grid(soup)
+        return Week(number_week, LazyDays(len(dates), lambda i: cls._create_day(dates, times, cells, i).freeze()))
 
-    @staticmethod
-    def _parse_start_semester(soup: BeautifulSoup) -> datetime.date:
-        """Функция для получения даты начала семестра для указанной группы"""
-        info = soup.find('div', class_='body-text info-block__semester')
-        day, month, year = map(int, re.search(r'\d{1,2}\.\d{1,2}\.\d{4}', info.text).group(0).split('.'))
-        return datetime.date(year, month, day)
+    @classmethod
+    @metrics.timed('parse')
+    def _parse_week(cls, html: str, number_week: int, lazy: bool = False) -> Week:
+        """
+        Разбирает HTML страницы расписания выбранным парсером.
+        С lazy=True сразу разбираются только даты и время, а пары каждого дня - при первом обращении к нему.
+        """
+        if cls.backend == 'lxml':
+            import lxml_parser
+            return (lxml_parser.create_lazy_week if lazy else lxml_parser.create_week)(html, number_week)
+
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'lxml')
+        return cls._create_lazy_week(soup, number_week) if lazy else cls._create_week(soup, number_week)
+
+    _START_SEMESTER_RE = re.compile(r'info-block__semester[^>]*>[^<]*?(\d{1,2})\.(\d{1,2})\.(\d{4})')
+
+    @classmethod
+    def _parse_start_semester(cls, html: str) -> datetime.date | None:
+        """
+        Функция для получения даты начала семестра для указанной группы.
+        Блок с датой стоит в начале страницы, поэтому он ищется в HTML без разбора всей страницы.
+        """
+        if match := cls._START_SEMESTER_RE.search(html):
+            day, month, year = map(int, match.groups())
+            return datetime.date(year, month, day)
+        return None
+
+    @classmethod
+    def _remember_calendar(cls, group_id: int, entry: CacheEntry) -> SemesterCalendar | None:
+        """
+        Календарь семестра по дате начала из записи кэша. Он актуален SEMESTER_TTL с момента загрузки
+        или подтверждения страницы, а уже известный более новый календарь группы не заменяется.
+        """
+        if entry.semester_start is None:
+            return None
+        calendar = SemesterCalendar(entry.semester_start, entry.expires_at - cls.CACHE_TTL + cls.SEMESTER_TTL)
+        known = cls._calendars.get(group_id)
+        if known is None or known.expires_at < calendar.expires_at:
+            known = cls._calendars[group_id] = calendar
+        return known
+
+    @classmethod
+    def get_semester_calendar(cls, group_id: int) -> SemesterCalendar | None:
+        """
+        Вернёт календарь семестра группы. Если его нет или он устарел, берёт его из текущей страницы группы
+        в кэше (в том числе дисковом, сохранённом до перезапуска), а если и она устарела, загружает её.
+        Если сайт недоступен, вернёт устаревший календарь или None.
+        """
+        calendar = cls._calendars.get(group_id)
+        if calendar is not None and calendar.fresh:
+            return calendar
+
+        def load():
+            entry = cls.cache.get(cls._cache_key(group_id))
+            known = (cls._remember_calendar(group_id, entry) if entry is not None else None) or calendar
+            if known is not None and known.fresh:
+                return known
+            try:
+                entry = cls._get_page(group_id)
+            except OSError:
+                return known
+            return cls._remember_calendar(group_id, entry) or known
+
+        return cls.flight.do(f'{group_id}:semester', load)
 
     @staticmethod
     def _get_date_start_semester(cur_date: datetime.date) -> datetime.date:
@@ -176,11 +470,21 @@ class SSAUParser:
         return first_monday_date
 
     @classmethod
-    def get_number_week(cls, date: datetime.date = None, start_semester: datetime.date = None) -> int:
-        """Функция для определения номера текущей недели"""
+    def get_number_week(cls, date: datetime.date = None, start_semester: datetime.date = None,
+                        group_id: int = None) -> int:
+        """
+        Функция для определения номера текущей недели.
+        С group_id номер берётся из календаря семестра группы (см. get_semester_calendar),
+        а если его получить не удалось, то, как и без группы, начало семестра определяется приблизительно.
+        """
         if date is None:
             date = datetime.date.today()
 
+        if start_semester is None and group_id is not None:
+            calendar = cls.get_semester_calendar(group_id)
+            if calendar is not None and calendar.covers(date):
+                return calendar.number_week(date)
+
         if start_semester is None:
             start_semester = cls._get_date_start_semester(date)
 
@@ -188,21 +492,213 @@ class SSAUParser:
         return ((date - date_first_learn_week) // 7).days + 1
 
     @classmethod
-    @lru_cache
-    def get_week(cls, group_id: int, number_week: int) -> Week:
-        """Вернёт расписание для указанной группы на указанную неделю"""
-        soup = cls._get_soup(group_id, number_week)
-        return cls._create_week(soup, number_week)
+    def load_snapshot(cls, path: str):
+        """
+        Заполняет кэш записями из снимка (см. cache.save_snapshot), не затирая уже имеющиеся,
+        и восстанавливает по ним календари семестров групп
+        """
+        for key, entry in load_snapshot(path).items():
+            group_id = int(key.partition(':')[0])
+            cls._remember_calendar(group_id, entry)
+            if cls.cache.get(key) is None:
+                cls.cache.set(key, entry)
+                cls._notify_listeners(group_id, entry.week)
+
+    @classmethod
+    def save_snapshot(cls, path: str, group_ids: Iterable[int], numbers_week: Iterable[int]):
+        """Сохраняет в снимок закэшированные недели указанных групп"""
+        numbers_week = list(numbers_week)
+        keys = [cls._cache_key(group_id, number_week) for group_id in group_ids for number_week in numbers_week]
+        save_snapshot(path, {key: entry for key in keys if (entry := cls.cache.get(key)) is not None})
+
+    @classmethod
+    def get_week(cls, group_id: int, number_week: int, lazy: bool = True) -> Week:
+        """
+        Вернёт расписание для указанной группы на указанную неделю.
+        Одновременные вызовы для одной и той же недели выполняют одну загрузку и один разбор страницы.
+        Дни недели разбираются при первом обращении к ним, а с lazy=False - сразу все в вызывающем потоке.
+        Так делают массовые загрузки, которым всё равно нужна вся неделя.
+        """
+        key = cls._cache_key(group_id, number_week)
+        entry = cls.cache.get(key)
+        if entry is not None and entry.fresh and entry.week is not None:
+            metrics.inc(metrics.CACHE_REQUESTS, result='hit')
+            week = entry.week
+        else:
+            week = cls.flight.do(key, lambda: cls._load_week(group_id, number_week))
+
+        if not lazy:
+            tuple(week.days)
+        return week
+
+    @classmethod
+    async def aget_week(cls, group_id: int, number_week: int) -> Week:
+        """Асинхронная версия get_week: загрузка выполняется в отдельном потоке"""
+        key = (id(asyncio.get_running_loop()), cls._cache_key(group_id, number_week))
+        return await cls.async_flight.do(key, lambda: asyncio.to_thread(cls.get_week, group_id, number_week))
+
+    @classmethod
+    def _load_week(cls, group_id: int, number_week: int) -> Week:
+        """
+        Загружает и разбирает неделю. Дни недели разбираются при первом обращении к ним (см. LazyDays),
+        поэтому get_day разбирает только нужный столбец страницы, а к остальным дням страница не обращается.
+        """
+        entry = cls._get_page(group_id, number_week)
+        if entry.week is None:
+            entry.set_week(cls._parse_week(entry.html, number_week, lazy=True))
+            # Запись страницы уже лежит в кэше (см. _get_page), повторная запись передаёт ему неделю.
+            # Дисковый уровень сериализует всю неделю, поэтому получит её, когда она будет разобрана (см. TieredCache)
+            cls.cache.set(cls._cache_key(group_id, number_week), entry)
+            # Слушатели тоже обходят всю неделю
+            entry.week.days.when_complete(lambda: cls._notify_listeners(group_id, entry.week))
+            return entry.week
+
+        cls._notify_listeners(group_id, entry.week)
+        return entry.week
+
+    @classmethod
+    def _notify_listeners(cls, group_id: int, week: Week):
+        if isinstance(week.days, LazyDays) and not week.days.complete:
+            # Слушателей вызовет when_complete, когда все дни недели будут разобраны
+            return
+
+        for listener in cls.week_listeners:
+            listener(group_id, week)
+
+    @classmethod
+    def get_weeks(cls, group_id: int, numbers_week: Iterable[int], max_workers: int = None) -> list[Week]:
+        """
+        Вернёт расписание для указанной группы на несколько недель.
+        Недели загружаются параллельно, одновременно выполняется не более max_workers запросов.
+        Порядок недель в результате совпадает с порядком numbers_week.
+        Недели разбираются целиком в потоках загрузки (см. get_week с lazy=False).
+        """
+        numbers_week = list(numbers_week)
+        if not numbers_week:
+            return []
+
+        max_workers = min(max_workers or cls.MAX_WORKERS, len(numbers_week))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Потоки пула не наследуют контекст, а с ним и приоритет запросов (см. ratelimit), передаём его явно
+            futures = [executor.submit(contextvars.copy_context().run, cls.get_week, group_id, number_week, False)
+                       for number_week in numbers_week]
+            return [future.result() for future in futures]
+
+    @classmethod
+    def _get_executor(cls, foreground: bool = False) -> ThreadPoolExecutor:
+        """Пул фоновых задач или, с foreground=True, пул загрузок для запросов пользователей"""
+        name = '_foreground_executor' if foreground else '_executor'
+        with cls._refreshing_lock:
+            if (executor := getattr(SSAUParser, name)) is None:
+                executor = ThreadPoolExecutor(max_workers=cls.MAX_WORKERS,
+                                              thread_name_prefix='ssau-foreground' if foreground else 'ssau-background')
+                setattr(SSAUParser, name, executor)
+            return executor
+
+    @classmethod
+    def _refresh_in_background(cls, group_id: int, number_week: int):
+        """Запускает обновление недели в фоне, если оно ещё не запущено"""
+        key = cls._cache_key(group_id, number_week)
+        with cls._refreshing_lock:
+            if key in cls._refreshing:
+                return
+            cls._refreshing.add(key)
+
+        def refresh():
+            try:
+                # Пользователь уже получил неделю из кэша, поэтому обновление не должно мешать другим запросам
+                with upstream_priority(Priority.BACKGROUND):
+                    cls.get_week(group_id, number_week)
+            finally:
+                with cls._refreshing_lock:
+                    cls._refreshing.discard(key)
+
+        cls._get_executor().submit(refresh)
+
+    @classmethod
+    def get_week_within(cls, group_id: int, number_week: int, deadline: float = None,
+                        stale_window: float = None) -> Week:
+        """
+        Вернёт неделю, не дожидаясь сайта дольше deadline секунд:
+        - актуальная неделя из кэша возвращается сразу;
+        - неделя, просроченная не более чем на stale_window секунд, тоже возвращается сразу,
+          а её обновление запускается в фоне;
+        - иначе неделя загружается, и если за deadline секунд этого не произошло, выбрасывается DeadlineExceeded.
+          Загрузка при этом продолжается в фоне, и повторный запрос скорее всего получит неделю из кэша.
+          С deadline=0 неделя берётся только из кэша, загрузка не запускается.
+        По умолчанию deadline и stale_window берутся из настроек (см. configure).
+        """
+        deadline = cls.settings.deadline if deadline is None else deadline
+        stale_window = cls.settings.stale_window if stale_window is None else stale_window
+
+        entry = cls.cache.get(cls._cache_key(group_id, number_week))
+        if entry is not None and entry.week is not None:
+            if entry.fresh:
+                metrics.inc(metrics.CACHE_REQUESTS, result='hit')
+                return entry.week
+            if time.time() - entry.expires_at <= stale_window:
+                metrics.inc(metrics.CACHE_REQUESTS, result='stale')
+                cls._refresh_in_background(group_id, number_week)
+                return entry.week
+
+        if deadline is None:
+            return cls.get_week(group_id, number_week)
+        if deadline <= 0:
+            raise DeadlineExceeded(f'Schedule is not in cache for group {group_id}, week {number_week}.')
+
+        future = cls._get_executor(foreground=True).submit(contextvars.copy_context().run,
+                                                           cls.get_week, group_id, number_week)
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeoutError:
+            raise DeadlineExceeded(f'Schedule was not loaded in {deadline} seconds.') from None
 
     @classmethod
     def get_current_week(cls, group_id: int) -> Week:
         """Вернёт текущую неделю для указанной группы"""
-        return cls.get_week(group_id, cls.get_number_week(datetime.date.today()))
+        return cls.get_week(group_id, cls.get_number_week(datetime.date.today(), group_id=group_id))
 
     @classmethod
     def get_day(cls, group_id: int, date: datetime.date) -> Day:
+        """Вернёт расписание на день, учитывая настройки deadline и stale_window (см. get_week_within)"""
         if date.weekday() == 6:
             return Day(date)
 
-        week = cls.get_week(group_id, cls.get_number_week(date))
-        return week.days[date.weekday()]
\ No newline at end of file
+        deadline = remaining = cls.settings.deadline
+        started = time.monotonic()
+        number_week = cls._get_number_week_within(group_id, date, deadline)
+        if deadline is not None:
+            # Загрузка календаря и недели вместе укладываются в deadline: если календарь занял его целиком,
+            # неделя берётся только из кэша
+            remaining = max(deadline - (time.monotonic() - started), 0)
+
+        try:
+            week = cls.get_week_within(group_id, number_week, remaining)
+        except DeadlineExceeded:
+            raise DeadlineExceeded(f'Schedule was not loaded in {deadline} seconds.') from None
+        return week.days[date.weekday()]
+
+    @classmethod
+    def _get_number_week_within(cls, group_id: int, date: datetime.date, deadline: float = None) -> int:
+        """
+        Номер недели по календарю семестра группы. Если календаря ещё нет, его загрузка ограничена deadline.
+        Не уложившись в него, выбрасывает DeadlineExceeded, а не гадает номер недели: загрузка и запрос неверной
+        недели только заняли бы сайт. Календарь при этом загружается дальше в фоне (заодно с текущей неделей,
+        см. _share_current_week). Устаревший календарь используется, пока загружается новый.
+        """
+        calendar = cls._calendars.get(group_id)
+        if calendar is None or not calendar.fresh:
+            if deadline is None:
+                calendar = cls.get_semester_calendar(group_id)
+            else:
+                future = cls._get_executor(foreground=True).submit(contextvars.copy_context().run,
+                                                                   cls.get_semester_calendar, group_id)
+                try:
+                    calendar = future.result(timeout=deadline)
+                except FutureTimeoutError:
+                    if calendar is None:
+                        raise DeadlineExceeded(f'Schedule was not loaded in {deadline} seconds.') from None
+
+        if calendar is not None and calendar.covers(date):
+            return calendar.number_week(date)
+        return cls.get_number_week(date)
\ No newline at end of file
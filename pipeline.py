@@ -0,0 +1,90 @@
+"""
+Конвейер для массовой загрузки расписания: страницы загружаются потоками, а разбираются в пуле процессов.
+Разбор страницы занимает процессор и держит GIL, поэтому при загрузке всех групп за семестр
+потоки ускоряют только сетевую часть. Здесь каждая загруженная страница сразу отправляется в процесс-разборщик,
+так что загрузка одних страниц идёт одновременно с разбором других на всех ядрах.
+Из процесса неделя возвращается в компактном виде (см. serialization) и сохраняется в кэш SSAUParser.
+"""
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Iterable
+
+import serialization
+from parser import SSAUParser
+from ratelimit import Priority, upstream_priority
+from schedule import Week
+
+
+def _parse_page(html: str, number_week: int, backend: str) -> bytes:
+    """Выполняется в процессе пула: разбирает страницу и возвращает сериализованную неделю"""
+    SSAUParser.backend = backend
+    return serialization.dumps(SSAUParser._parse_week(html, number_week))
+
+
+class ParsePipeline:
+    """
+    Загрузка и разбор недель групп. fetch_workers - потоки для запросов к сайту,
+    parse_workers - процессы для разбора (по умолчанию по числу ядер).
+    Пул процессов создаётся один раз и переиспользуется между вызовами crawl, закрывается в close.
+    """
+
+    def __init__(self, fetch_workers: int = 8, parse_workers: int = None, parser: type[SSAUParser] = SSAUParser):
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.parser = parser
+        self._processes = ProcessPoolExecutor(max_workers=self.parse_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._processes.shutdown()
+
+    def crawl(self, group_ids: Iterable[int],
+              numbers_week: Iterable[int]) -> tuple[dict[tuple[int, int], Week], dict[tuple[int, int], Exception]]:
+        """
+        Загружает и разбирает недели всех групп. Уже разобранные недели из кэша повторно не разбираются.
+        Вернёт недели и ошибки по парам (группа, неделя).
+        """
+        numbers_week = list(numbers_week)
+        jobs = [(group_id, number_week) for group_id in group_ids for number_week in numbers_week]
+        weeks, errors = {}, {}
+        parsing: dict[Future, tuple[int, int]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as threads:
+            fetching = {threads.submit(self._fetch, *job): job for job in jobs}
+            for future in as_completed(fetching):
+                job = fetching[future]
+                if error := future.exception():
+                    errors[job] = error
+                elif (week := future.result().week) is not None:
+                    weeks[job] = week
+                else:
+                    # Пока эта страница разбирается, потоки продолжают загружать следующие
+                    parsing[self._processes.submit(_parse_page, future.result().html, job[1],
+                                                   self.parser.backend)] = job
+
+        for future in as_completed(parsing):
+            group_id, number_week = job = parsing[future]
+            if error := future.exception():
+                errors[job] = error
+                continue
+
+            weeks[job] = self._store(group_id, number_week, serialization.loads(future.result()))
+
+        return weeks, errors
+
+    def _fetch(self, group_id: int, number_week: int):
+        with upstream_priority(Priority.BACKGROUND):
+            return self.parser._get_page(group_id, number_week)
+
+    def _store(self, group_id: int, number_week: int, week: Week) -> Week:
+        key = self.parser._cache_key(group_id, number_week)
+        if (entry := self.parser.cache.get(key)) is not None:
+            entry.set_week(week)
+            self.parser.cache.set(key, entry)
+        self.parser._notify_listeners(group_id, week)
+        return week
@@ -0,0 +1,183 @@
+"""
+Предварительная загрузка расписания в кэш для списка групп и диапазона недель.
+Запускается заранее (например, ночью), чтобы утренние запросы к навыку не ждали сайт.
+Кэш должен быть общим с навыком, поэтому задайте путь к нему через SSAU_CACHE_PATH.
+SSAU_DISK_CACHE_SIZE (по умолчанию 50 000 страниц) должен быть не меньше числа групп, умноженного на число недель
+(плюс по странице на группу для календаря семестра), иначе загрузка вытеснит из кэша то, что только что загрузила.
+
+Пример:
+    SSAU_CACHE_PATH=/data/ssau.db python prefetch.py --groups 531030143 799359428 --weeks 1-18 --rate 5
+
+Прогресс сохраняется в файл --checkpoint, и прерванный в тот же день запуск с теми же неделями продолжится
+с того же места. После запуска без ошибок файл удаляется, поэтому следующий запуск снова обновит весь кэш.
+С флагом --snapshot загруженные недели дополнительно сохраняются в снимок, который навык загружает
+на холодном старте (переменная окружения SSAU_SNAPSHOT_PATH).
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from parser import SSAUParser
+from ratelimit import Priority, upstream_priority
+
+
+class Checkpoint:
+    """
+    Множество уже загруженных пар (группа, неделя), периодически сохраняемое в JSON файл.
+    Прогресс относится к одному запуску (scope, например дата и диапазон недель):
+    файл с другим scope считается устаревшим и не учитывается.
+    """
+
+    def __init__(self, path: str | None, scope: str = '', save_every: int = 20):
+        self.path = path
+        self.scope = scope
+        self.save_every = save_every
+        self.done: set[str] = set()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('scope') == scope:
+                self.done = set(data['done'])
+
+    @staticmethod
+    def key(group_id: int, number_week: int) -> str:
+        return f'{group_id}:{number_week}'
+
+    def __contains__(self, item: tuple[int, int]) -> bool:
+        return self.key(*item) in self.done
+
+    def mark_done(self, group_id: int, number_week: int):
+        with self._lock:
+            self.done.add(self.key(group_id, number_week))
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+
+        # Записываем во временный файл и подменяем, чтобы прерывание не испортило checkpoint
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'scope': self.scope, 'done': sorted(self.done)}, file)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+    def clear(self):
+        """Удаляет файл после полностью завершённого запуска"""
+        with self._lock:
+            self.done.clear()
+            self._unsaved = 0
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def current_weeks(group_id: int) -> list[int]:
+    """
+    Текущая и следующая недели группы по её календарю семестра.
+    Календарь может потребовать запроса к сайту, он выполняется с фоновым приоритетом.
+    """
+    with upstream_priority(Priority.BACKGROUND):
+        current_week = SSAUParser.get_number_week(group_id=group_id)
+    return [current_week, current_week + 1]
+
+
+def prefetch(group_ids: list[int], numbers_week: list[int] = None, workers: int = 8,
+             checkpoint: Checkpoint = None) -> dict[tuple[int, int], Exception]:
+    """
+    Загружает расписание всех групп на все указанные недели (по умолчанию текущую и следующую
+    по календарю каждой группы) в кэш SSAUParser.
+    Частота запросов ограничивается общим для процесса ограничителем SSAUParser (настройка rate_limit).
+    Возвращает ошибки для пар (группа, неделя), которые загрузить не удалось.
+    Если ошибок нет, checkpoint удаляется.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+
+    def fetch(group_id: int, number_week: int):
+        entry = SSAUParser.cache.get(SSAUParser._cache_key(group_id, number_week))
+        if entry is not None and entry.fresh and entry.week is not None:
+            # Неделя уже в кэше и актуальна, к сайту обращаться не нужно
+            return
+
+        # Запросы пользователей навыка в том же процессе обслуживаются раньше
+        with upstream_priority(Priority.BACKGROUND):
+            SSAUParser.get_week(group_id, number_week, lazy=False)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if numbers_week:
+            jobs = [(group_id, number_week) for group_id in group_ids for number_week in numbers_week]
+        else:
+            # Календари групп загружаются параллельно в тех же потоках, а заодно кэшируют страницы текущих недель
+            resolved = executor.map(current_weeks, group_ids)
+            jobs = [(group_id, number_week) for group_id, weeks in zip(group_ids, resolved) for number_week in weeks]
+        jobs = [job for job in jobs if job not in checkpoint]
+
+        futures = {executor.submit(fetch, *job): job for job in jobs}
+        for i, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            if error := future.exception():
+                errors[job] = error
+            else:
+                checkpoint.mark_done(*job)
+            print(f'\r{i}/{len(jobs)}, ошибок: {len(errors)}', end='', flush=True)
+
+    if errors:
+        checkpoint.save()
+    else:
+        checkpoint.clear()
+    print()
+    return errors
+
+
+def parse_weeks(value: str) -> list[int]:
+    """Преобразует диапазон недель вида `5-10` или `7` в список номеров"""
+    start, _, end = value.partition('-')
+    return list(range(int(start), int(end or start) + 1))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--groups', type=int, nargs='*', default=[], help='id групп')
+    arg_parser.add_argument('--groups-file', help='файл с id групп, по одному в строке')
+    arg_parser.add_argument('--weeks', type=parse_weeks, help='диапазон недель, по умолчанию текущая и следующая')
+    arg_parser.add_argument('--workers', type=int, default=8, help='количество параллельных загрузок')
+    arg_parser.add_argument('--rate', type=float, default=5, help='не больше стольких запросов в секунду')
+    arg_parser.add_argument('--checkpoint', default='prefetch_checkpoint.json', help='файл с прогрессом')
+    arg_parser.add_argument('--snapshot', help='сохранить загруженные недели в снимок для холодного старта')
+    args = arg_parser.parse_args()
+
+    group_ids = list(args.groups)
+    if args.groups_file:
+        with open(args.groups_file, encoding='utf-8') as file:
+            group_ids += [int(line) for line in file if line.strip()]
+
+    SSAUParser.configure(pool_size=args.workers, read_timeout=30, retries=5, rate_limit=args.rate)
+    SSAUParser.backend = 'lxml'
+
+    weeks = f'{args.weeks[0]}-{args.weeks[-1]}' if args.weeks else 'current'
+    checkpoint = Checkpoint(args.checkpoint, scope=f'{datetime.date.today().isoformat()} {weeks}')
+    errors = prefetch(group_ids, args.weeks, args.workers, checkpoint)
+    for (group_id, number_week), error in errors.items():
+        print(f'Группа {group_id}, неделя {number_week}: {error}')
+
+    if args.snapshot:
+        # Календари уже загружены в prefetch, к сайту здесь обращаться не нужно
+        numbers_week = args.weeks or sorted({number_week for group_id in group_ids
+                                              for number_week in current_weeks(group_id)})
+        SSAUParser.save_snapshot(args.snapshot, group_ids, numbers_week)
+
+
+if __name__ == '__main__':
+    main()
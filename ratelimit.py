@@ -0,0 +1,129 @@
+"""
+Ограничение частоты запросов к ssau.ru с приоритетами.
+Запросы навыка (интерактивные) и фоновые загрузки (prefetch, выгрузка календарей, фоновое обновление кэша)
+берут токены из одного ведра, но фоновые запросы пропускают вперёд ожидающие интерактивные
+и не трогают последние reserve токенов, чтобы пользователю навыка всегда оставалось место.
+
+Приоритет задаётся для текущего контекста и наследуется потоками SSAUParser (и asyncio.to_thread в aget_week):
+
+    with upstream_priority(Priority.BACKGROUND):
+        SSAUParser.get_weeks(group_id, range(1, 19))
+
+Одновременные запросы одной недели объединяются (см. singleflight), и интерактивный запрос,
+присоединившийся к уже ожидающему фоновому, ждёт вместе с ним.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+
+import metrics
+
+
+class Priority(IntEnum):
+    """Чем меньше значение, тем выше приоритет"""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_priority: ContextVar[Priority] = ContextVar('upstream_priority', default=Priority.INTERACTIVE)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def upstream_priority(priority: Priority):
+    """Запросы к сайту внутри блока выполняются с указанным приоритетом"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass
+class PriorityStats:
+    """Статистика одного класса приоритета, времена в секундах"""
+    acquired: int = 0
+    waiting: int = 0
+    max_waiting: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class PriorityTokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше burst накопленных.
+    acquire блокирует поток до получения токена, поэтому для asyncio его нужно вызывать в отдельном потоке,
+    как это и происходит в SSAUParser.aget_week.
+    """
+
+    def __init__(self, rate: float, burst: int = 5, reserve: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self.stats = {priority: PriorityStats() for priority in Priority}
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _required(self, priority: Priority) -> int:
+        """Сколько токенов должно быть в ведре, чтобы запрос с таким приоритетом мог взять один"""
+        return 1 if priority == Priority.INTERACTIVE else 1 + self.reserve
+
+    def _can_take(self, priority: Priority) -> bool:
+        if any(self.stats[higher].waiting for higher in Priority if higher < priority):
+            return False
+        return self._tokens >= self._required(priority)
+
+    def acquire(self, priority: Priority = None) -> float:
+        """Ждёт токен с приоритетом текущего контекста (или указанным). Вернёт время ожидания в секундах"""
+        priority = current_priority() if priority is None else priority
+        stats = self.stats[priority]
+        start = time.monotonic()
+
+        with self._condition:
+            stats.waiting += 1
+            stats.max_waiting = max(stats.max_waiting, stats.waiting)
+            try:
+                while True:
+                    self._refill()
+                    if self._can_take(priority):
+                        self._tokens -= 1
+                        break
+                    # Ждём появления нужного количества токенов или освобождения очереди с более высоким приоритетом
+                    self._condition.wait(max((self._required(priority) - self._tokens) / self.rate, 0.001))
+            finally:
+                stats.waiting -= 1
+                self._condition.notify_all()
+
+            waited = time.monotonic() - start
+            stats.acquired += 1
+            stats.total_wait += waited
+            stats.max_wait = max(stats.max_wait, waited)
+
+        metrics.observe('ssau_upstream_wait_seconds', waited, priority=priority.name.lower())
+        return waited
+
+    def snapshot(self) -> dict:
+        """Глубина очередей и время ожидания по классам приоритета"""
+        with self._condition:
+            return {
+                priority.name.lower(): {
+                    'waiting': stats.waiting,
+                    'max_waiting': stats.max_waiting,
+                    'acquired': stats.acquired,
+                    'avg_wait': stats.total_wait / stats.acquired if stats.acquired else 0.0,
+                    'max_wait': stats.max_wait,
+                }
+                for priority, stats in self.stats.items()
+            }
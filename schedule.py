@@ -1,19 +1,29 @@
 import datetime
+import hashlib
+import sys
+import threading
 from dataclasses import dataclass, field
 from itertools import zip_longest
+from typing import Callable, Sequence
 
-from prettytable import PrettyTable
 
+def _intern(value: str | None) -> str | None:
+    """Одинаковые строки (преподаватели, аудитории, группы) повторяются в тысячах пар, храним один экземпляр"""
+    return sys.intern(value) if value is not None else None
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Pair:
-    """Класс одной конкретной пары"""
+    """
+    Класс одной конкретной пары.
+    Пара неизменяема, поэтому один и тот же объект можно безопасно использовать в нескольких неделях.
+    """
     discipline_name: str
     teacher: str = None
     place: str = None
     pair_type: int = None
-    groups: set[str] = field(default_factory=list)
-    subgroups: set[int] = field(default_factory=set)
+    groups: tuple[str, ...] = ()
+    subgroups: tuple[int, ...] = ()
     
     PAIR_TYPES = {
         1: 'Лекция',
@@ -24,13 +34,35 @@ class Pair:
         6: 'Консультация',
         8: 'Зачёт',
     }
+    
+    def __post_init__(self):
+        # Парсер передаёт группы и подгруппы множествами, храним их в отсортированных кортежах
+        object.__setattr__(self, 'discipline_name', _intern(self.discipline_name))
+        object.__setattr__(self, 'teacher', _intern(self.teacher))
+        object.__setattr__(self, 'place', _intern(self.place))
+        object.__setattr__(self, 'groups', tuple(sorted(map(sys.intern, self.groups))))
+        object.__setattr__(self, 'subgroups', tuple(sorted(self.subgroups)))
+    
+    @property
+    def identity(self) -> tuple:
+        """Что определяет пару независимо от преподавателя и аудитории, по этому ключу сравниваются недели"""
+        return self.discipline_name, self.pair_type, self.groups, self.subgroups
+    
+    def content_key(self) -> str:
+        """Каноническое строковое представление пары для подсчёта хэшей"""
+        return '\x1f'.join([self.discipline_name or '', self.teacher or '', self.place or '', str(self.pair_type),
+                             ','.join(self.groups), ','.join(map(str, self.subgroups))])
 
 
-@dataclass
+def _content_hash(parts: list[str]) -> str:
+    return hashlib.blake2b('\x1e'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+@dataclass(slots=True)
 class PairsSet:
     """Класс набора учебных пар в одно время"""
     number: int
-    pairs_set: list[Pair] = field(default_factory=list, compare=False)
+    pairs_set: Sequence[Pair] = field(default=(), compare=False)
     
     TIMES = {
         1: (datetime.time(8, 0), datetime.time(9, 35)),
@@ -55,15 +87,26 @@ class PairsSet:
     
     def __iter__(self):
         return iter(self.pairs_set)
+    
+    def freeze(self) -> 'PairsSet':
+        """Вернёт неизменяемую копию, пары при этом не копируются"""
+        return PairsSet(self.number, tuple(self.pairs_set))
+    
+    def content_hash(self) -> str:
+        """Хэш содержимого, не зависящий от процесса и порядка пар. Меняется при любом изменении пар"""
+        return _content_hash([str(self.number), *sorted(pair.content_key() for pair in self.pairs_set)])
 
 
-@dataclass
+@dataclass(slots=True)
 class Day:
     """Класс одного учебного дня"""
     date: datetime.date
-    pairs: list[PairsSet] = field(default_factory=list)
+    pairs: Sequence[PairsSet] = field(default_factory=list)
     
     def __str__(self):
+        # prettytable нужен только для вывода в консоль, не загружаем его при импорте модуля
+        from prettytable import PrettyTable
+        
         table = PrettyTable()
         table.field_names = [str(self.date)]
         table.align = 'l'
@@ -88,18 +131,108 @@ class Day:
             if len(pair):
                 break
             self.pairs.pop()
+    
+    def freeze(self) -> 'Day':
+        return Day(self.date, tuple(pairs_set.freeze() for pairs_set in self.pairs))
+    
+    def content_hash(self) -> str:
+        """Хэш содержимого дня. Пустые наборы пар не учитываются, поэтому обрезка дня (strip_day) хэш не меняет"""
+        return _content_hash([self.date.isoformat(),
+                              *(pairs_set.content_hash() for pairs_set in self.pairs if len(pairs_set))])
+
+
+class LazyDays(Sequence[Day]):
+    """
+    Дни недели, которые разбираются из ячеек страницы только при первом обращении к ним.
+    build_day(i) создаёт i-й день, созданный день запоминается. Когда разобраны все дни,
+    ссылка на build_day (а с ней и на дерево страницы) отпускается и вызываются функции из when_complete.
+    При сериализации (pickle) разбираются все дни и сохраняется обычный кортеж.
+    """
+    
+    __slots__ = ('_days', '_build_day', '_lock', '_on_complete')
+    
+    def __init__(self, amount: int, build_day: Callable[[int], Day]):
+        self._days: list[Day | None] = [None] * amount
+        self._build_day = build_day if amount else None
+        self._lock = threading.Lock()
+        self._on_complete: list[Callable[[], None]] = []
+    
+    def __len__(self):
+        return len(self._days)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        
+        if (day := self._days[index]) is None:
+            on_complete = ()
+            with self._lock:
+                if (day := self._days[index]) is None:
+                    day = self._days[index] = self._build_day(index % len(self._days))
+                    if all(built is not None for built in self._days):
+                        self._build_day = None
+                        on_complete, self._on_complete = self._on_complete, []
+            for callback in on_complete:
+                callback()
+        return day
+    
+    @property
+    def materialized(self) -> int:
+        """Сколько дней уже разобрано"""
+        return sum(day is not None for day in self._days)
+    
+    @property
+    def complete(self) -> bool:
+        """Разобраны ли все дни"""
+        return self._build_day is None
+    
+    def when_complete(self, callback: Callable[[], None]):
+        """
+        Вызовет callback() в потоке, который разберёт последний день, или сразу, если все дни уже разобраны.
+        Сам по себе разбор не запускает: оставшиеся дни так и не разбираются, если к ним не обращаются.
+        """
+        with self._lock:
+            if self._build_day is not None:
+                self._on_complete.append(callback)
+                return
+        callback()
+    
+    def __eq__(self, other):
+        if isinstance(other, (LazyDays, tuple, list)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+    
+    def __reduce__(self):
+        return tuple, (tuple(self),)
 
 
-@dataclass
+@dataclass(slots=True)
 class Week:
     """Класс одной учебной недели"""
     number_week: int
-    days: list[Day]
+    days: Sequence[Day]
     
     def __iter__(self):
         return iter(self.days)
     
+    def freeze(self) -> 'Week':
+        """
+        Вернёт неизменяемую копию недели (дни и наборы пар хранятся в кортежах).
+        Такую неделю можно отдавать нескольким потребителям из кэша, не опасаясь, что кто-то её изменит.
+        Ленивая неделя (LazyDays) не меняется, а её дни создаются уже неизменяемыми, поэтому она возвращается как есть.
+        """
+        if isinstance(self.days, LazyDays):
+            return self
+        
+        return Week(self.number_week, tuple(day.freeze() for day in self.days))
+    
+    def content_hash(self) -> str:
+        """Хэш содержимого недели, составленный из хэшей её дней"""
+        return _content_hash([str(self.number_week), *(day.content_hash() for day in self.days)])
+    
     def __str__(self):
+        from prettytable import PrettyTable
+        
         table = PrettyTable()
         table.align = 'l'
         table.add_column('Время',
@@ -0,0 +1,200 @@
+"""
+Обратный индекс по всем загруженным неделям всех групп: преподаватель, аудитория, дисциплина, дата и номер пары.
+Позволяет ответить на вопросы "где сейчас преподаватель X" или "что идёт в аудитории Y",
+не загружая расписания всех групп.
+Индекс обновляется по мере загрузки недель парсером: подпишите его через SSAUParser.week_listeners.
+"""
+import datetime
+import re
+import threading
+from collections import defaultdict
+from typing import Iterable, NamedTuple
+
+from schedule import Pair, Week
+
+
+class Lesson(NamedTuple):
+    """Пара в конкретный день. Общая лекция нескольких групп - одно занятие, а не несколько"""
+    date: datetime.date
+    number: int
+    pair: Pair
+
+
+_SPACES_RE = re.compile(r'\s+')
+_WORD_RE = re.compile(r'\w+')
+# Аудитория записана на сайте как "205 - 24 корп.", ключом служит "205-24"
+_PLACE_RE = re.compile(r'(\S+?)\s*-\s*(\d+)')
+
+FIELDS = ('teacher', 'place', 'discipline_name')
+
+# Падежные окончания фамилий и слов в названиях: "петрова", "петрову", "петровым" -> "петров",
+# "достоевского" -> "достоевск". Сначала проверяются длинные окончания
+_ENDINGS = ('ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ой', 'ей', 'ым', 'им', 'ом', 'ем', 'ую', 'юю', 'ая', 'яя',
+            'ий', 'ый', 'а', 'я', 'у', 'ю', 'е', 'ы', 'и', 'ь', 'о')
+_MIN_STEM = 3
+
+
+def normalize(field: str, text: str) -> str:
+    """Ключ значения поля: без учёта регистра, буквы ё и лишних пробелов"""
+    text = _SPACES_RE.sub(' ', text.lower().replace('ё', 'е')).strip()
+    if field == 'place' and (match := _PLACE_RE.match(text)):
+        return f'{match.group(1)}-{match.group(2)}'
+    return text
+
+
+def stem(word: str) -> str:
+    """Основа слова без падежного окончания: "иванова", "иванову" и "иванов" дают одну основу"""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def place_building(place: str) -> str | None:
+    """Номер корпуса из названия аудитории ("205 - 24 корп." -> "24"), None для аудиторий без корпуса"""
+    match = _PLACE_RE.match(place.strip())
+    return match.group(2) if match else None
+
+
+class ScheduleIndex:
+    """
+    Индекс занятий. Для каждого поля хранится отображение ключ -> занятия и слово -> ключи,
+    поэтому искать можно как по полному значению ("Петров Пётр Петрович"), так и по отдельным словам ("петров").
+    Одно и то же занятие встречается в неделях нескольких групп, поэтому для него ведётся счётчик ссылок,
+    и при обновлении недели одной группы занятия других групп не пропадают.
+    Слово, которого нет в индексе, ищется по основе (см. stem), то есть в любом падеже.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._weeks: dict[tuple[int, int], list[Lesson]] = {}
+        self._refs: dict[Lesson, int] = {}
+        self._by_key = {field: defaultdict(set) for field in FIELDS}
+        self._by_word = {field: defaultdict(set) for field in FIELDS}
+        self._by_stem = {field: defaultdict(set) for field in FIELDS}
+        self._by_date: defaultdict[datetime.date, set[Lesson]] = defaultdict(set)
+        self._by_slot: defaultdict[tuple[datetime.date, int], set[Lesson]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self._refs)
+
+    def __call__(self, group_id: int, week: Week):
+        self.update(group_id, week)
+
+    def update(self, group_id: int, week: Week):
+        """Заменяет в индексе неделю группы. Повторная передача той же недели ничего не меняет"""
+        lessons = [Lesson(day.date, pairs_set.number, pair)
+                   for day in week.days for pairs_set in day.pairs for pair in pairs_set]
+
+        with self._lock:
+            old_lessons = self._weeks.get((group_id, week.number_week), [])
+            if old_lessons == lessons:
+                return
+
+            self._weeks[(group_id, week.number_week)] = lessons
+            for lesson in old_lessons:
+                self._release(lesson)
+            for lesson in lessons:
+                self._acquire(lesson)
+
+    def _acquire(self, lesson: Lesson):
+        self._refs[lesson] = self._refs.get(lesson, 0) + 1
+        if self._refs[lesson] > 1:
+            return
+
+        for field in FIELDS:
+            if value := getattr(lesson.pair, field):
+                key = normalize(field, value)
+                self._by_key[field][key].add(lesson)
+                for word in _WORD_RE.findall(key):
+                    if word not in self._by_word[field]:
+                        self._by_stem[field][stem(word)].add(word)
+                    self._by_word[field][word].add(key)
+        self._by_date[lesson.date].add(lesson)
+        self._by_slot[(lesson.date, lesson.number)].add(lesson)
+
+    def _release(self, lesson: Lesson):
+        self._refs[lesson] -= 1
+        if self._refs[lesson]:
+            return
+
+        del self._refs[lesson]
+        for field in FIELDS:
+            if value := getattr(lesson.pair, field):
+                key = normalize(field, value)
+                if _discard(self._by_key[field], key, lesson):
+                    for word in _WORD_RE.findall(key):
+                        if _discard(self._by_word[field], word, key):
+                            _discard(self._by_stem[field], stem(word), word)
+        _discard(self._by_date, lesson.date, lesson)
+        _discard(self._by_slot, (lesson.date, lesson.number), lesson)
+
+    def _find_field(self, field: str, query: str) -> set[Lesson]:
+        key = normalize(field, query)
+        if key in self._by_key[field]:
+            return self._by_key[field][key]
+
+        # Ключи, содержащие все слова запроса
+        keys = None
+        for word in _WORD_RE.findall(key):
+            word_keys = self._word_keys(field, word)
+            keys = word_keys if keys is None else keys & word_keys
+        return set().union(*(self._by_key[field][key] for key in keys or ()))
+
+    def _word_keys(self, field: str, word: str) -> set[str]:
+        if (keys := self._by_word[field].get(word)) is not None:
+            return keys
+        # Слово в другом падеже: ключи всех слов с той же основой
+        return set().union(*(self._by_word[field][similar] for similar in self._by_stem[field].get(stem(word), ())))
+
+    def has_teacher(self, name: str) -> bool:
+        """Есть ли в индексе преподаватель с таким словом в имени (в любом падеже)"""
+        with self._lock:
+            return bool(self._find_field('teacher', name))
+
+    def find(self, teacher: str = None, place: str = None, discipline: str = None,
+             date: datetime.date = None, number: int = None) -> list[Lesson]:
+        """
+        Вернёт занятия, подходящие под все указанные условия, в порядке даты и номера пары.
+        Например, find(teacher='петров', date=today) - все пары преподавателя сегодня.
+        """
+        with self._lock:
+            candidates = []
+            for field, query in zip(FIELDS, (teacher, place, discipline)):
+                if query:
+                    candidates.append(self._find_field(field, query))
+            if date is not None and number is not None:
+                candidates.append(self._by_slot.get((date, number), set()))
+            elif date is not None:
+                candidates.append(self._by_date.get(date, set()))
+
+            if not candidates:
+                return []
+
+            candidates.sort(key=len)
+            lessons = candidates[0].intersection(*candidates[1:])
+
+        if number is not None and date is None:
+            lessons = [lesson for lesson in lessons if lesson.number == number]
+        return sorted(lessons, key=lambda lesson: (lesson.date, lesson.number))
+
+    def build(self, group_ids: Iterable[int], numbers_week: Iterable[int]):
+        """Заполняет индекс неделями групп через SSAUParser.get_weeks (обычно из кэша)"""
+        from parser import SSAUParser
+
+        numbers_week = list(numbers_week)
+        for group_id in group_ids:
+            for week in SSAUParser.get_weeks(group_id, numbers_week):
+                self.update(group_id, week)
+
+
+def _discard(index: dict, key, value) -> bool:
+    """Удаляет значение из множества по ключу, а опустевшее множество - из индекса. Вернёт True, если ключ удалён"""
+    values = index.get(key)
+    if values is None:
+        return False
+    values.discard(value)
+    if not values:
+        del index[key]
+        return True
+    return False
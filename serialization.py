@@ -0,0 +1,75 @@
+"""
+Компактная сериализация недели расписания для хранения в кэше и передачи между процессами.
+
+Формат - JSON с версией и таблицей строк: каждая строка (дисциплина, преподаватель, аудитория, группа)
+записывается один раз, а пары ссылаются на неё по индексу. Даты хранятся порядковым номером дня.
+
+    {"version": 1, "number_week": 3, "strings": [...],
+     "days": [[date_ordinal, [[number, [[discipline, teacher, place, pair_type, [groups], [subgroups]], ...]], ...]], ...]}
+"""
+import datetime
+import json
+
+from schedule import Pair, PairsSet, Day, Week
+
+VERSION = 1
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: list[str] = []
+        self._indexes: dict[str, int] = {}
+
+    def index(self, value: str | None) -> int | None:
+        if value is None:
+            return None
+        if (index := self._indexes.get(value)) is None:
+            index = self._indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def dumps(week: Week) -> bytes:
+    """Сериализует неделю в байты"""
+    table = _StringTable()
+    days = [
+        [day.date.toordinal(), [
+            [pairs_set.number, [
+                [table.index(pair.discipline_name), table.index(pair.teacher), table.index(pair.place),
+                 pair.pair_type, [table.index(group) for group in pair.groups], list(pair.subgroups)]
+                for pair in pairs_set
+            ]]
+            for pairs_set in day.pairs
+        ]]
+        for day in week.days
+    ]
+    data = {'version': VERSION, 'number_week': week.number_week, 'strings': table.strings, 'days': days}
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: bytes | str) -> Week:
+    """
+    Восстанавливает неделю, сериализованную dumps. Неделя возвращается неизменяемой (см. Week.freeze).
+    Если данные записаны другой версией формата, выбрасывается ValueError.
+    """
+    data = json.loads(data)
+    if data.get('version') != VERSION:
+        raise ValueError(f"Unsupported serialization version: {data.get('version')}")
+
+    strings = data['strings']
+
+    def string(index: int | None) -> str | None:
+        return None if index is None else strings[index]
+
+    days = tuple(
+        Day(datetime.date.fromordinal(date), tuple(
+            PairsSet(number, tuple(
+                Pair(string(discipline), string(teacher), string(place), pair_type,
+                     [strings[group] for group in groups], subgroups)
+                for discipline, teacher, place, pair_type, groups, subgroups in pairs
+            ))
+            for number, pairs in pairs_sets
+        ))
+        for date, pairs_sets in data['days']
+    )
+    return Week(data['number_week'], days)
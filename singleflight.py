@@ -0,0 +1,74 @@
+"""
+Объединение одновременных одинаковых запросов (single-flight).
+Пока для ключа выполняется вызов, остальные вызовы с тем же ключом не запускают свой,
+а ждут первый и получают тот же результат (или то же исключение).
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+@dataclass
+class FlightStats:
+    """Счётчики: сколько всего было вызовов и сколько из них присоединились к уже выполняющемуся"""
+    calls: int = 0
+    coalesced: int = 0
+
+
+class SingleFlight:
+    """Single-flight для потоков"""
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._flights: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            self.stats.calls += 1
+            if (future := self._flights.get(key)) is not None:
+                self.stats.coalesced += 1
+                leader = False
+            else:
+                future = self._flights[key] = Future()
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(func())
+        except BaseException as error:
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return future.result()
+
+
+class AsyncSingleFlight:
+    """Single-flight для asyncio, ключи общие в пределах одного цикла событий"""
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        self.stats.calls += 1
+        if (future := self._flights.get(key)) is not None:
+            self.stats.coalesced += 1
+            # shield: отмена одного ожидающего не должна отменять общий вызов
+            return await asyncio.shield(future)
+
+        future = self._flights[key] = asyncio.ensure_future(func())
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._flights.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._flights.pop(key, None))
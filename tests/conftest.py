@@ -0,0 +1,39 @@
+"""Общие фикстуры: SSAUParser, направленный на локальную замену сайта (benchmarks/stub_server) с чистым кэшем"""
+import pytest
+
+import index
+from benchmarks.stub_server import start_stub_server
+from cache import MemoryCache
+from parser import SSAUParser
+
+# Функции навыка, которые один раз за процесс настраивают SSAUParser и создают индексы (functools.cache)
+_HANDLER_SETUP = (index.get_parser, index.get_schedule_index, index.get_room_occupancy)
+
+
+@pytest.fixture(autouse=True)
+def fresh_parser(monkeypatch):
+    """
+    Каждый тест начинает с ненастроенного навыком SSAUParser: get_parser выполняется заново, слушатели недель
+    (индекс занятий и занятость аудиторий) не переходят из предыдущих тестов, а настройки, которые меняет тест,
+    возвращаются после него
+    """
+    monkeypatch.setattr(SSAUParser, 'week_listeners', [])
+    monkeypatch.setattr(SSAUParser, 'settings', SSAUParser.settings)
+    monkeypatch.setattr(SSAUParser, '_limiter', SSAUParser.__dict__.get('_limiter'))
+    monkeypatch.setattr(SSAUParser, '_session', SSAUParser.__dict__.get('_session'))
+    for function in _HANDLER_SETUP:
+        function.cache_clear()
+    yield
+    for function in _HANDLER_SETUP:
+        function.cache_clear()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Запущенная замена сайта. Страницы можно подменять через stub.RequestHandlerClass.pages"""
+    server, url = start_stub_server()
+    monkeypatch.setattr(SSAUParser, '_URL', url)
+    monkeypatch.setattr(SSAUParser, 'cache', MemoryCache())
+    monkeypatch.setattr(SSAUParser, '_calendars', {})
+    yield server
+    server.shutdown()
@@ -0,0 +1,16 @@
+from cache import CacheEntry, SQLiteCache
+
+
+def test_sqlite_evicts_least_recently_used_over_max_size(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_size=3)
+    for key in 'abc':
+        cache.set(key, CacheEntry(key))
+    cache.get('a')
+    cache.set('c', CacheEntry('c2'))
+    assert len(cache) == 3
+
+    cache.set('d', CacheEntry('d'))
+
+    assert [key for key in 'abcd' if cache.get(key) is not None] == ['a', 'c', 'd']
+    # Новое подключение к той же базе видит то же число записей
+    assert len(SQLiteCache(str(tmp_path / 'cache.db'), max_size=3)) == 3
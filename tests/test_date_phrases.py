@@ -0,0 +1,60 @@
+"""Разбор даты из фразы (index.parse_date_from_phrase): все виды фраз _DATE_PHRASE_RE при зафиксированном сегодня"""
+import datetime
+
+import pytest
+
+from index import parse_date_from_phrase
+
+# Среда
+TODAY = datetime.date(2024, 9, 18)
+
+
+@pytest.mark.parametrize('phrase, expected', [
+    # Слова относительно сегодня
+    ('расписание на сегодня', datetime.date(2024, 9, 18)),
+    ('что завтра', datetime.date(2024, 9, 19)),
+    ('какие пары послезавтра', datetime.date(2024, 9, 20)),
+    ('что было вчера', datetime.date(2024, 9, 17)),
+    # Дни недели в разных падежах: ближайший будущий, сегодняшний - через неделю
+    ('пары в пятницу', datetime.date(2024, 9, 20)),
+    ('к пятнице', datetime.date(2024, 9, 20)),
+    ('до воскресенья', datetime.date(2024, 9, 22)),
+    ('в среду', datetime.date(2024, 9, 25)),
+    # "следующий" - на неделю позже ближайшего, "было" - ближайший прошедший
+    ('в следующий вторник', datetime.date(2024, 10, 1)),
+    ('что было в понедельник', datetime.date(2024, 9, 16)),
+    ('что было в среду', datetime.date(2024, 9, 11)),
+    # Число: ближайшее в этом или следующем месяце, с месяцем - в этом или следующем году
+    ('на 20 число', datetime.date(2024, 9, 20)),
+    ('на 5 число', datetime.date(2024, 10, 5)),
+    ('на 1 октября', datetime.date(2024, 10, 1)),
+    ('на 30 апреля', datetime.date(2025, 4, 30)),
+    ('на 18 сентября', datetime.date(2024, 9, 18)),
+    # Сдвиги вперёд и назад на дни, недели, месяцы и годы
+    ('через 3 дня', datetime.date(2024, 9, 21)),
+    ('через 2 недели', datetime.date(2024, 10, 2)),
+    ('через 4 месяца', datetime.date(2025, 1, 18)),
+    ('через 2 года', datetime.date(2026, 9, 18)),
+    ('3 дня назад', datetime.date(2024, 9, 15)),
+    ('2 недели назад', datetime.date(2024, 9, 4)),
+    ('10 месяцев назад', datetime.date(2023, 11, 18)),
+    ('10 лет назад', datetime.date(2014, 9, 18)),
+    # Опечатки в днях недели разбираются нечётким сравнением
+    ('в пятницк', datetime.date(2024, 9, 20)),
+])
+def test_date_phrases(phrase, expected):
+    result = parse_date_from_phrase(phrase, TODAY)
+
+    assert result == expected
+    # Раньше сдвиги на месяцы и годы возвращали datetime, а не date
+    assert type(result) is datetime.date
+
+
+def test_month_shift_clamps_day():
+    assert parse_date_from_phrase('через 1 месяц', datetime.date(2024, 1, 31)) == datetime.date(2024, 2, 29)
+    assert parse_date_from_phrase('1 месяц назад', datetime.date(2024, 3, 31)) == datetime.date(2024, 2, 29)
+
+
+def test_unknown_phrase():
+    with pytest.raises(ValueError):
+        parse_date_from_phrase('абракадабра', TODAY)
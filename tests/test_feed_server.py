@@ -0,0 +1,96 @@
+import pytest
+import requests
+
+from feed_server import FeedStore, UnknownSubgroup, etag_matches, start_feed_server
+from lxml_parser import create_week
+from parser import SSAUParser
+
+GROUP_ID = 531030143
+
+
+@pytest.fixture
+def feed_url(stub):
+    # Одна неделя в календаре и проверка изменений при каждом запросе
+    server, url = start_feed_server(FeedStore(weeks_before=0, weeks_ahead=0, check_interval=0))
+    yield f'{url}/{GROUP_ID}.ics'
+    server.shutdown()
+
+
+def replace_teacher(stub, group_id: int):
+    """Меняет преподавателя первой пары на всех записанных страницах группы"""
+    pages = stub.RequestHandlerClass.pages
+    for (page_group_id, number_week), html in pages.items():
+        if page_group_id != group_id:
+            continue
+        week = create_week(html, number_week)
+        teacher = next(pair.teacher for day in week.days for pairs_set in day.pairs for pair in pairs_set
+                       if pair.teacher)
+        pages[(page_group_id, number_week)] = html.replace(teacher.encode('utf-8'), 'Тестов Т. Т.'.encode('utf-8'))
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", W/"abc"', True),
+    ('*', True),
+    ('"abcd"', False),
+    ('abc', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_feed_returns_calendar(feed_url):
+    response = requests.get(feed_url)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/calendar')
+    assert response.text.startswith('BEGIN:VCALENDAR')
+    assert 'BEGIN:VEVENT' in response.text
+    assert response.headers['ETag']
+
+
+def test_feed_not_modified(feed_url):
+    etag = requests.get(feed_url).headers['ETag']
+
+    for header in (etag, f'W/{etag}', f'"other", {etag}'):
+        response = requests.get(feed_url, headers={'If-None-Match': header})
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response.headers['ETag'] == etag
+
+    assert requests.get(feed_url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_feed_regenerated_after_change(stub, feed_url):
+    first = requests.get(feed_url)
+
+    replace_teacher(stub, GROUP_ID)
+    SSAUParser.cache.clear()
+    response = requests.get(feed_url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != first.headers['ETag']
+    assert 'Тестов Т. Т.' in response.text
+    assert 'Тестов Т. Т.' not in first.text
+
+
+def test_feed_errors(stub, feed_url):
+    base_url = feed_url.rsplit('/', 1)[0]
+
+    assert requests.get(f'{feed_url}?subgroup=x').status_code == 400
+    assert requests.get(f'{base_url}/unknown').status_code == 404
+    assert requests.get(f'{base_url}/1.ics').status_code == 502
+    assert requests.get(f'{feed_url}?subgroup=7').status_code == 404
+
+
+def test_feed_store_is_bounded(stub):
+    store = FeedStore(weeks_before=0, weeks_ahead=0, max_feeds=2)
+    for subgroup in (None, 1, 2):
+        store.get(GROUP_ID, subgroup)
+
+    assert len(store) == 2
+    with pytest.raises(UnknownSubgroup):
+        store.get(GROUP_ID, 7)
+    assert len(store) == 2
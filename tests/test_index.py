@@ -0,0 +1,110 @@
+"""Маршрутизация фраз обработчиком навыка: вопрос о преподавателе или о своём расписании"""
+import copy
+import datetime
+
+import pytest
+
+import index
+import run
+from schedule import Day, Pair, PairsSet, Week
+
+GROUP_ID = 531030143
+
+
+def make_event(phrase: str, **user_state) -> dict:
+    event = copy.deepcopy(run.request)
+    event['session']['new'] = False
+    event['request']['original_utterance'] = event['request']['command'] = phrase
+    event['state']['user'].update(user_state)
+    return event
+
+
+def ask(phrase: str, **user_state) -> str:
+    return index.handler(make_event(phrase, **user_state), None)['response']['text']
+
+
+@pytest.fixture
+def teacher_indexed(stub):
+    """В индексе сегодня одна пара преподавателя Петрова"""
+    index.get_parser()
+    pair = Pair('Математический анализ', 'Петров Иван Сергеевич', '205 - 24 корп.', 1, {'6411-100503d'}, set())
+    week = Week(1000, (Day(datetime.date.today(), (PairsSet(1, (pair,)),)),))
+    index.get_schedule_index().update(1, week)
+    yield
+    index.get_schedule_index().update(1, Week(1000, ()))
+
+
+@pytest.mark.parametrize('phrase', ['где петров сегодня', 'где петрова сегодня', 'где сейчас петрову сегодня'])
+def test_known_teacher_in_any_case(teacher_indexed, phrase):
+    text = ask(phrase, group_id=GROUP_ID)
+
+    assert text.startswith('Пары преподавателя Петров Иван Сергеевич')
+    assert 'Математический анализ' in text
+
+
+def test_explicit_teacher_marker(teacher_indexed):
+    text = ask('где преподаватель сидоров сегодня', group_id=GROUP_ID)
+
+    assert text.startswith('Не нашла пар преподавателя Сидоров')
+
+
+@pytest.mark.parametrize('phrase', ['где у меня пары завтра', 'где первая пара завтра', 'где пары в понедельник'])
+def test_own_schedule_questions_are_not_teacher_lookups(teacher_indexed, phrase):
+    text = ask(phrase, group_id=GROUP_ID)
+
+    assert text.startswith('Расписание на')
+
+
+def test_schedule_question(stub):
+    assert ask('расписание на завтра', group_id=GROUP_ID).startswith('Расписание на')
+    assert ask('расписание на завтра') == 'Напиши мне id своей группы.'
+
+
+@pytest.fixture
+def rooms_loaded(stub):
+    """Сегодня аудитория 101 корпуса 3 занята на первой паре, 102 корпуса 3 - на второй, 205 корпуса 24 - на первой"""
+    index.get_parser()
+    today = datetime.date.today()
+
+    def pairs_set(number: int, place: str) -> PairsSet:
+        return PairsSet(number, (Pair('Физика', 'Сидоров С. С.', place, 1, {'1111'}, set()),))
+
+    week = Week(1000, (Day(today, (pairs_set(1, '101 - 3 корп.'), pairs_set(2, '102 - 3 корп.'))),))
+    other_week = Week(1000, (Day(today, (pairs_set(1, '205 - 24 корп.'),)),))
+    index.get_room_occupancy().update(2, week)
+    index.get_room_occupancy().update(3, other_week)
+    yield
+    index.get_room_occupancy().update(2, Week(1000, ()))
+    index.get_room_occupancy().update(3, Week(1000, ()))
+
+
+@pytest.mark.parametrize('phrase, free, busy', [
+    ('какие аудитории свободны сегодня на первой паре', ['102 - 3 корп.'], ['101 - 3 корп.', '205 - 24 корп.']),
+    ('свободные аудитории на 2 паре сегодня', ['101 - 3 корп.', '205 - 24 корп.'], ['102 - 3 корп.']),
+    ('свободные аудитории в 3 корпусе сегодня на 2-й паре', ['101 - 3 корп.'], ['205 - 24 корп.']),
+])
+def test_free_rooms(rooms_loaded, phrase, free, busy):
+    text = ask(phrase, group_id=GROUP_ID)
+
+    assert text.startswith('Свободные аудитории')
+    assert all(room in text for room in free)
+    assert not any(room in text for room in busy)
+
+
+def test_free_rooms_unknown_date(rooms_loaded):
+    assert ask('свободные аудитории 1 января на 1 паре').startswith('Не знаю, какие аудитории свободны')
+
+
+def test_subgroup_is_remembered():
+    response = index.handler(make_event('моя подгруппа 2', group_id=GROUP_ID), None)
+
+    assert response['user_state_update'] == {'subgroup': 2}
+    assert '2 подгруппы' in response['response']['text']
+
+
+def test_each_test_gets_configured_handler(stub):
+    parser = index.get_parser()
+
+    # Слушатели и настройки навыка не переходят из других тестов (см. conftest.fresh_parser)
+    assert parser.week_listeners == [index.get_schedule_index(), index.get_room_occupancy()]
+    assert parser.settings.deadline == 2.5
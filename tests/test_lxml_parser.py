@@ -0,0 +1,42 @@
+"""
+lxml_parser должен разбирать записанные страницы в точности как SSAUParser._create_week (bs4).
+Недели сравниваются по сериализации: сравнение Week (==) не учитывает содержимое пар (см. PairsSet.pairs_set).
+"""
+import pytest
+from bs4 import BeautifulSoup
+
+import lxml_parser
+import serialization
+from benchmarks.common import load_html_fixtures
+from parser import SSAUParser
+
+FIXTURES = load_html_fixtures()
+
+
+@pytest.mark.parametrize('group_id, number_week', sorted(FIXTURES))
+def test_lxml_week_matches_bs4(group_id, number_week):
+    html = FIXTURES[(group_id, number_week)]
+    expected = SSAUParser._create_week(BeautifulSoup(html, 'lxml'), number_week).freeze()
+
+    week = lxml_parser.create_week(html, number_week).freeze()
+
+    assert serialization.dumps(week) == serialization.dumps(expected)
+    assert len(week.days) == 6
+
+
+@pytest.mark.parametrize('group_id, number_week', sorted(FIXTURES))
+def test_lazy_weeks_match_eager(group_id, number_week):
+    html = FIXTURES[(group_id, number_week)]
+    expected = serialization.dumps(lxml_parser.create_week(html, number_week).freeze())
+
+    assert serialization.dumps(lxml_parser.create_lazy_week(html, number_week)) == expected
+    assert serialization.dumps(SSAUParser._create_lazy_week(BeautifulSoup(html, 'lxml'), number_week)) == expected
+
+
+def test_fixtures_contain_lessons():
+    """Сравнение имеет смысл, только если на записанных страницах есть пары"""
+    weeks = [lxml_parser.create_week(html, number_week) for (_, number_week), html in FIXTURES.items()]
+    pairs = [pair for week in weeks for day in week.days for pairs_set in day.pairs for pair in pairs_set]
+    assert len(pairs) > 20
+    assert all(pair.discipline_name for pair in pairs)
+    assert any(pair.teacher for pair in pairs) and any(pair.place for pair in pairs)
@@ -0,0 +1,174 @@
+import datetime
+import time
+
+import pytest
+from requests import HTTPError
+
+import serialization
+from cache import CacheEntry, MemoryCache, SQLiteCache, TieredCache
+from parser import DeadlineExceeded, SSAUParser
+from schedule import Week
+
+GROUP_ID = 531030143
+# 17.09.2024 - вторник третьей недели на записанных страницах
+DATE = datetime.date(2024, 9, 17)
+
+
+@pytest.fixture
+def requests_log(stub) -> list[str]:
+    """Адреса запросов, дошедших до замены сайта"""
+    log = []
+    handler = stub.RequestHandlerClass
+    do_get = handler.do_GET
+
+    def logged_do_get(self):
+        log.append(self.path)
+        do_get(self)
+
+    handler.do_GET = logged_do_get
+    return log
+
+
+@pytest.fixture
+def tiered_cache(stub, tmp_path, monkeypatch) -> TieredCache:
+    cache = TieredCache(MemoryCache(), SQLiteCache(str(tmp_path / 'cache.db')))
+    monkeypatch.setattr(SSAUParser, 'cache', cache)
+    return cache
+
+
+def test_get_day_parses_one_day(tiered_cache, monkeypatch):
+    notified = []
+    monkeypatch.setattr(SSAUParser, 'week_listeners', [lambda group_id, week: notified.append(week)])
+
+    day = SSAUParser.get_day(GROUP_ID, DATE)
+
+    assert day.date == DATE
+    week = tiered_cache.front.get(SSAUParser._cache_key(GROUP_ID, 3)).week
+    assert week.days.materialized == 1
+    # Остальные дни не разбираются, пока к ним не обратятся, а в дисковый кэш и слушателям неделя попадёт целиком
+    assert tiered_cache.back.get(SSAUParser._cache_key(GROUP_ID, 3)).week is None
+    assert not notified
+
+
+def test_week_persisted_once_fully_read(tiered_cache, monkeypatch):
+    notified = []
+    monkeypatch.setattr(SSAUParser, 'week_listeners', [lambda group_id, week: notified.append(week)])
+
+    week = SSAUParser.get_week(GROUP_ID, 3)
+    days = tuple(week.days)
+
+    # Дерево страницы больше не нужно
+    assert week.days.complete and week.days._build_day is None
+    assert serialization.dumps(tiered_cache.back.get(SSAUParser._cache_key(GROUP_ID, 3)).week) == \
+        serialization.dumps(Week(3, days))
+    assert notified == [week]
+
+
+def test_lazy_week_persisted_on_eviction(tiered_cache, monkeypatch):
+    notified = []
+    monkeypatch.setattr(SSAUParser, 'week_listeners', [lambda group_id, week: notified.append(week)])
+    SSAUParser.get_day(GROUP_ID, DATE)
+    week = tiered_cache.front.get(SSAUParser._cache_key(GROUP_ID, 3)).week
+
+    tiered_cache.front.max_size = 1
+    tiered_cache.set('other', CacheEntry(''))
+
+    assert tiered_cache.front.get(SSAUParser._cache_key(GROUP_ID, 3)) is None
+    assert serialization.dumps(tiered_cache.back.get(SSAUParser._cache_key(GROUP_ID, 3)).week) == \
+        serialization.dumps(week)
+    assert notified == [week]
+
+
+def test_bulk_weeks_are_built(tiered_cache):
+    weeks = SSAUParser.get_weeks(GROUP_ID, [3, 4])
+
+    assert all(week.days.complete for week in weeks)
+    assert all(tiered_cache.back.get(SSAUParser._cache_key(GROUP_ID, week.number_week)).week is not None
+               for week in weeks)
+
+
+def test_cold_get_day_reuses_current_page(stub, requests_log):
+    # Страница без selectedWeek на замене сайта - третья неделя, она же нужна для DATE
+    day = SSAUParser.get_day(GROUP_ID, DATE)
+
+    assert day.date == DATE and day.pairs
+    assert len(requests_log) == 1
+    assert 'selectedWeek' not in requests_log[0]
+
+
+def test_calendar_survives_restart(stub, requests_log, tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.db')
+    monkeypatch.setattr(SSAUParser, 'cache', TieredCache(MemoryCache(), SQLiteCache(path)))
+    calendar = SSAUParser.get_semester_calendar(GROUP_ID)
+
+    # Новый процесс: календарей в памяти нет, дисковый кэш тот же
+    monkeypatch.setattr(SSAUParser, '_calendars', {})
+    monkeypatch.setattr(SSAUParser, 'cache', TieredCache(MemoryCache(), SQLiteCache(path)))
+
+    assert SSAUParser.get_semester_calendar(GROUP_ID) == calendar
+    assert calendar.start == datetime.date(2024, 9, 2)
+    assert len(requests_log) == 1
+
+
+def test_calendar_restored_from_snapshot(stub, tmp_path, monkeypatch):
+    path = str(tmp_path / 'snapshot.json')
+    SSAUParser.get_week(GROUP_ID, 4)
+    SSAUParser.save_snapshot(path, [GROUP_ID], [4])
+    calendar = SSAUParser._calendars[GROUP_ID]
+
+    monkeypatch.setattr(SSAUParser, '_calendars', {})
+    monkeypatch.setattr(SSAUParser, 'cache', MemoryCache())
+    SSAUParser.load_snapshot(path)
+
+    assert SSAUParser._calendars[GROUP_ID] == calendar
+    assert SSAUParser.get_number_week(DATE, group_id=GROUP_ID) == 3
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+def test_retries_take_rate_limit_tokens(stub, requests_log):
+    stub.RequestHandlerClass.error_rate = 1
+    SSAUParser.configure(retries=2, backoff_factor=0, rate_limit=1000)
+    limiter = SSAUParser._limiter = CountingLimiter()
+
+    with pytest.raises(HTTPError):
+        SSAUParser.get_week(GROUP_ID, 3)
+
+    assert len(requests_log) == 3
+    assert limiter.acquired == 3
+
+
+def test_calendar_timeout_does_not_fetch_guessed_week(stub, requests_log):
+    stub.RequestHandlerClass.latency, stub.RequestHandlerClass.jitter = 0.5, 0
+    SSAUParser.configure(deadline=0.1)
+
+    with pytest.raises(DeadlineExceeded, match='0.1 seconds'):
+        SSAUParser.get_day(GROUP_ID, DATE)
+
+    # Календарь загружается дальше в фоне и заодно кэширует текущую неделю, а недели по приблизительному номеру
+    # никто не запрашивает
+    time.sleep(1)
+    assert requests_log == [f'/rasp?groupId={GROUP_ID}']
+    assert SSAUParser.get_day(GROUP_ID, DATE).date == DATE
+    assert len(requests_log) == 1
+
+
+def test_html_released_once_week_parsed(tiered_cache):
+    week = SSAUParser.get_week(GROUP_ID, 4)
+    entry = tiered_cache.front.get(SSAUParser._cache_key(GROUP_ID, 4))
+
+    assert entry.week is week and entry.html == ''
+    assert entry.fresh
+
+
+def test_sqlite_entry_without_html_or_week_is_a_miss(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+    cache.set('key', CacheEntry('', etag='"etag"', expires_at=time.time() + 60))
+
+    assert cache.get('key') is None
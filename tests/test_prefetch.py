@@ -0,0 +1,23 @@
+import prefetch
+from parser import SSAUParser
+from ratelimit import Priority, current_priority
+
+GROUP_IDS = [531030143, 799359428]
+
+
+def test_current_weeks_resolved_in_background(stub, monkeypatch):
+    priorities = []
+    get_page = SSAUParser._get_page.__func__
+
+    def logged_get_page(cls, group_id, selected_week=None):
+        priorities.append((selected_week, current_priority()))
+        return get_page(cls, group_id, selected_week)
+
+    monkeypatch.setattr(SSAUParser, '_get_page', classmethod(logged_get_page))
+
+    assert prefetch.prefetch(GROUP_IDS) == {}
+    # Сначала календари групп (страница без selectedWeek), затем недели, и всё с фоновым приоритетом
+    assert [week for week, _ in priorities].count(None) == len(GROUP_IDS)
+    assert {priority for _, priority in priorities} == {Priority.BACKGROUND}
+    assert all(SSAUParser.cache.get(SSAUParser._cache_key(group_id, number_week)).week is not None
+               for group_id in GROUP_IDS for number_week in prefetch.current_weeks(group_id))
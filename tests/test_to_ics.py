@@ -0,0 +1,19 @@
+import datetime
+
+from schedule import Day, Pair, PairsSet, Week
+from to_ics import iter_events, pair_uid
+
+DATE = datetime.date(2024, 9, 16)
+
+
+def test_uids_unique_for_same_identity_pairs():
+    # Язык у двух преподавателей в одно время, без подгрупп
+    english = [Pair('Иностранный язык', teacher, place, 3, ('6201',)) for teacher, place in
+               [('Иванова И. И.', '401-5'), ('Петрова П. П.', '402-5')]]
+    week = Week(3, [Day(DATE, [PairsSet(1, english), PairsSet(2, english[:1])])])
+
+    uids = [event.uid for event in iter_events([week])]
+
+    assert len(set(uids)) == 3
+    # Первая такая пара сохраняет прежний UID, замена преподавателя его не меняет
+    assert uids[0] == pair_uid(DATE, 1, english[0]) == pair_uid(DATE, 1, english[1])
@@ -1,9 +1,86 @@
+import argparse
+import contextvars
+import csv
 import datetime
-from copy import deepcopy
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, TextIO
 
+import metrics
 from parser import SSAUParser
-from schedule import PairsSet, Week
+from prefetch import parse_weeks
+from ratelimit import Priority, upstream_priority
+from schedule import PairsSet, Week, Pair
+from views import WeekView
+
+# По RFC 5545 строки разделяются CRLF, а строки длиннее 75 октетов переносятся
+CRLF = '\r\n'
+MAX_LINE_OCTETS = 75
+
+CALENDAR_HEADER = CRLF.join(['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Python//NONSGML v1.0//EN']) + CRLF
+CALENDAR_FOOTER = 'END:VCALENDAR' + CRLF
+
+# Неизменная часть каждого события
+_EVENT_FOOTER = CRLF.join(['STATUS:CONFIRMED', 'TRANSP:OPAQUE',
+                           'BEGIN:VALARM', 'TRIGGER:-PT10M', 'ACTION:DISPLAY', 'END:VALARM',
+                           'END:VEVENT']) + CRLF
+
+_ESCAPE_TABLE = str.maketrans({'\\': '\\\\', ';': '\\;', ',': '\\,', '\n': '\\n', '\r': ''})
+
+
+def escape_text(text: str) -> str:
+    """Экранирует значение типа TEXT (RFC 5545, 3.3.11)"""
+    return text.translate(_ESCAPE_TABLE)
+
+
+def fold_line(line: str) -> str:
+    """Переносит строку длиннее 75 октетов (RFC 5545, 3.1), не разрывая многобайтовые символы UTF-8"""
+    data = line.encode('utf-8')
+    if len(data) <= MAX_LINE_OCTETS:
+        return line
+    
+    parts, start = [], 0
+    # Первая строка может занимать 75 октетов, продолжения - 74, так как начинаются с пробела
+    limit = MAX_LINE_OCTETS
+    while len(data) - start > limit:
+        end = start + limit
+        # Байты вида 10xxxxxx - продолжение символа UTF-8, перед ними резать нельзя
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, MAX_LINE_OCTETS - 1
+    parts.append(data[start:].decode('utf-8'))
+    
+    return (CRLF + ' ').join(parts)
+
+
+@lru_cache(maxsize=4096)
+def _text_property(name: str, value: str) -> str:
+    """Готовая строка свойства с текстовым значением. Названия дисциплин, аудитории и т.п. повторяются,
+    поэтому результат кэшируется."""
+    return fold_line(f'{name}:{escape_text(value)}')
+
+
+def _pair_identity(pair: Pair) -> tuple:
+    return pair.discipline_name or '', str(pair.pair_type), ','.join(pair.groups), ','.join(map(str, pair.subgroups))
+
+
+def pair_uid(date: datetime.date, number: int, pair: Pair, occurrence: int = 0) -> str:
+    """
+    Стабильный идентификатор события. Зависит от даты, номера пары, дисциплины, типа и групп,
+    но не от преподавателя и аудитории, поэтому при их замене клиент обновит событие, а не создаст новое.
+    Пары одного времени с одинаковыми дисциплиной, типом и группами (например, язык у разных преподавателей
+    без подгрупп) различаются порядковым номером occurrence, так как UID в календаре не должны повторяться.
+    """
+    parts = [date.isoformat(), str(number), *_pair_identity(pair)]
+    if occurrence:
+        parts.append(f'#{occurrence}')
+    key = '|'.join(parts)
+    return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}@ssau-schedule-bot"
 
 
 @dataclass
@@ -14,87 +91,193 @@ class Event:
     end_time: datetime.datetime
     location: str = None
     description: str = None
+    uid: str = None
     
-    def to_ics(self) -> str:
-        """Преобразует событие в формат iCal."""
-        return f"""BEGIN:VEVENT
-SUMMARY:{self.title}
-DTSTART:{self.start_time.strftime('%Y%m%dT%H%M%S')}
-DTEND:{self.end_time.strftime('%Y%m%dT%H%M%S')}
-LOCATION:{self.location or ''}
-DESCRIPTION:{self.description or ''}
-STATUS:CONFIRMED
-TRANSP:OPAQUE
-BEGIN:VALARM
-TRIGGER:-PT10M
-ACTION:DISPLAY
-END:VALARM
-END:VEVENT
-"""
-
-
-def generate_ics_from_week(weeks: list[Week]) -> str:
-    """Генерирует iCalendar строку на основе объекта Week."""
-    ics_content = "BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//Python//NONSGML v1.0//EN\n"
-    
+    def to_ics(self, stamp: str = None) -> str:
+        """Преобразует событие в формат iCal, stamp - значение DTSTAMP (по умолчанию текущее время)."""
+        stamp = stamp or datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        lines = ['BEGIN:VEVENT']
+        if self.uid:
+            lines.append(f'UID:{self.uid}')
+        lines.append(f'DTSTAMP:{stamp}')
+        lines.append(_text_property('SUMMARY', self.title))
+        lines.append(f"DTSTART:{self.start_time.strftime('%Y%m%dT%H%M%S')}")
+        lines.append(f"DTEND:{self.end_time.strftime('%Y%m%dT%H%M%S')}")
+        if self.location:
+            lines.append(_text_property('LOCATION', self.location))
+        if self.description:
+            lines.append(_text_property('DESCRIPTION', self.description))
+        return CRLF.join(lines) + CRLF + _EVENT_FOOTER
+
+
+def iter_events(weeks: Iterable[Week]) -> Iterator[Event]:
+    """Создаёт события календаря для всех пар указанных недель."""
     for week in weeks:
         for day in week.days:
             for pairs_set in day.pairs:
                 start_time, end_time = PairsSet.TIMES[pairs_set.number]
                 
+                # Преобразуем время в datetime с учетом даты
+                event_start = datetime.datetime.combine(day.date, start_time)
+                event_end = datetime.datetime.combine(day.date, end_time)
+                
+                occurrences = Counter()
                 for pair in pairs_set:
-                    # Преобразуем время в datetime с учетом даты
-                    event_start = datetime.datetime.combine(day.date, start_time)
-                    event_end = datetime.datetime.combine(day.date, end_time)
-                    
-                    # Формируем описание и название события
-                    title = pair.discipline_name
-                    location = pair.place if pair.place else None
-                    description = f"Преподаватель: {pair.teacher}" if pair.teacher else None
-                    
-                    # Создаем событие и добавляем его в ics content
-                    ics_content += Event(title=title,
-                                         start_time=event_start,
-                                         end_time=event_end,
-                                         location=location,
-                                         description=description).to_ics()
+                    identity = _pair_identity(pair)
+                    occurrence = occurrences[identity]
+                    occurrences[identity] += 1
+                    yield Event(title=pair.discipline_name,
+                                start_time=event_start,
+                                end_time=event_end,
+                                location=pair.place or None,
+                                description=f"Преподаватель: {pair.teacher}" if pair.teacher else None,
+                                uid=pair_uid(day.date, pairs_set.number, pair, occurrence))
+
+
+def iter_ics(weeks: Iterable[Week], chunk_size: int = 64 * 1024) -> Iterator[str]:
+    """
+    Построчно формирует календарь и отдаёт его частями примерно по chunk_size символов.
+    Весь файл в памяти не собирается, поэтому части можно сразу писать в файл или в HTTP ответ.
+    """
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    chunk, chunk_length = [CALENDAR_HEADER], len(CALENDAR_HEADER)
+    
+    for event in iter_events(weeks):
+        text = event.to_ics(stamp)
+        chunk.append(text)
+        chunk_length += len(text)
+        if chunk_length >= chunk_size:
+            yield ''.join(chunk)
+            chunk, chunk_length = [], 0
     
-    ics_content += "END:VCALENDAR"
-    return ics_content
+    chunk.append(CALENDAR_FOOTER)
+    yield ''.join(chunk)
 
 
-def create_ics_file(filename: str, weeks: list[Week]):
+def write_ics(file: TextIO, weeks: Iterable[Week]):
+    """Записывает календарь в открытый файл по частям."""
+    for chunk in iter_ics(weeks):
+        file.write(chunk)
+
+
+@metrics.timed('generate_ics')
+def generate_ics_from_week(weeks: Iterable[Week]) -> str:
+    """Генерирует iCalendar строку на основе объекта Week."""
+    return ''.join(iter_ics(weeks))
+
+
+def create_ics_file(filename: str, weeks: Iterable[Week]):
     """Создает .ics файл на основе объекта Week."""
-    ics_content = generate_ics_from_week(weeks)
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(ics_content)
+    # newline='' - чтобы переводы строк CRLF записались без изменений на любой ОС
+    with open(filename, 'w', encoding='utf-8', newline='') as file:
+        write_ics(file, weeks)
     print(f"Файл {filename} успешно создан!")
 
 
-def filter_by_subgroup(week: Week, subgroup: int) -> Week:
-    filtered_week = deepcopy(week)
-    for day in filtered_week.days:
-        for pairs_set in day.pairs:
-            for pair in pairs_set:
-                if pair.subgroups and subgroup not in pair.subgroups:
-                    pairs_set.pairs_set.remove(pair)
+def filter_by_subgroup(week: Week, subgroup: int) -> WeekView:
+    """Представление недели только с парами подгруппы, расписание при этом не копируется (см. views)"""
+    return WeekView(week).subgroup(subgroup)
+
+
+@dataclass(frozen=True)
+class ExportJob:
+    """Один календарь пакетной выгрузки: группа, подгруппа (None - вся группа) и диапазон недель"""
+    group_id: int
+    subgroup: int | None
+    numbers_week: tuple[int, ...]
+    filename: str = None
     
-    return filtered_week
+    def default_filename(self) -> str:
+        subgroup = f'_sub{self.subgroup}' if self.subgroup else ''
+        return f"{self.group_id}{subgroup}_{self.numbers_week[0]}_{self.numbers_week[-1]}.ics"
+
+
+def read_manifest(path: str) -> list[ExportJob]:
+    """
+    Читает CSV манифест: в каждой строке id группы, подгруппа (может быть пустой), диапазон недель вида `1-18`
+    и, необязательно, имя файла. Пустые строки и строки, начинающиеся с #, пропускаются.
+    
+        531030143,,1-18
+        531030143,2,1-18,pmi-2.ics
+    """
+    jobs = []
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            group_id, subgroup, weeks, *filename = (value.strip() for value in row)
+            jobs.append(ExportJob(int(group_id), int(subgroup) if subgroup else None,
+                                  tuple(parse_weeks(weeks)), filename[0] if filename else None))
+    return jobs
+
+
+def batch_export(jobs: list[ExportJob], output_dir: str = '.', workers: int = 8) -> dict[ExportJob, Exception]:
+    """
+    Выгружает календари по списку заданий. Каждая неделя каждой группы загружается и разбирается один раз,
+    сколько бы подгрупп её ни использовали, а календари записываются параллельно.
+    Вернёт ошибки по заданиям, которые выполнить не удалось.
+    """
+    needed = sorted({(job.group_id, number_week) for job in jobs for number_week in job.numbers_week})
+    weeks, fetch_errors = {}, {}
+    
+    with upstream_priority(Priority.BACKGROUND), ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {key: executor.submit(contextvars.copy_context().run, SSAUParser.get_week, *key, False)
+                   for key in needed}
+        for key, future in futures.items():
+            if error := future.exception():
+                fetch_errors[key] = error
+            else:
+                weeks[key] = future.result()
+    
+    def export(job: ExportJob):
+        if error := next((fetch_errors[(job.group_id, number_week)] for number_week in job.numbers_week
+                          if (job.group_id, number_week) in fetch_errors), None):
+            raise error
+        
+        job_weeks = [weeks[(job.group_id, number_week)] for number_week in job.numbers_week]
+        if job.subgroup:
+            job_weeks = [filter_by_subgroup(week, job.subgroup) for week in job_weeks]
+        create_ics_file(os.path.join(output_dir, job.filename or job.default_filename()), job_weeks)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {job: executor.submit(export, job) for job in jobs}
+        for job, future in futures.items():
+            if error := future.exception():
+                errors[job] = error
+    return errors
 
 
 def main():
+    arg_parser = argparse.ArgumentParser(
+        description='Выгрузка расписания в .ics. Без аргументов параметры запрашиваются в консоли.')
+    arg_parser.add_argument('--manifest', help='CSV файл с заданиями: группа,подгруппа,недели[,файл]')
+    arg_parser.add_argument('--output-dir', default='.', help='каталог для календарей')
+    arg_parser.add_argument('--workers', type=int, default=8, help='количество параллельных загрузок и записей')
+    arg_parser.add_argument('--rate', type=float, default=5, help='не больше стольких запросов к сайту в секунду')
+    args = arg_parser.parse_args()
+    
+    # Выгрузка не ограничена по времени, поэтому можно ждать дольше и чаще повторять запросы
+    SSAUParser.configure(read_timeout=30, retries=5, rate_limit=args.rate)
+    SSAUParser.backend = 'lxml'
+    
+    if args.manifest:
+        errors = batch_export(read_manifest(args.manifest), args.output_dir, args.workers)
+        for job, error in errors.items():
+            print(f'Группа {job.group_id}, подгруппа {job.subgroup}: {error}')
+        return
+    
     group_id = int(input('Укажите ID вашей группы: '))
     subgroup = input('Укажите вашу подгруппу (опционально): ')
     print('Укажите интересующий вас диапазон.')
-    start_number_week = input('Начиная с недели под номером: ') or SSAUParser.get_number_week()
+    start_number_week = input('Начиная с недели под номером: ') or SSAUParser.get_number_week(group_id=group_id)
     end_number_week = input('До (включительно) недели под номером: ')
     
-    weeks = []
-    for i in range(int(start_number_week), int(end_number_week) + 1):
-        week = SSAUParser.get_week(group_id, i)
-        if subgroup:
-            week = filter_by_subgroup(week, int(subgroup))
-        weeks.append(week)
+    with upstream_priority(Priority.BACKGROUND):
+        weeks = SSAUParser.get_weeks(group_id, range(int(start_number_week), int(end_number_week) + 1))
+    if subgroup:
+        weeks = [filter_by_subgroup(week, int(subgroup)) for week in weeks]
     
     create_ics_file(f"{group_id}_{start_number_week}_{end_number_week}.ics", weeks)
 
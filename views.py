@@ -0,0 +1,163 @@
+"""
+Отфильтрованные представления недели, дня и набора пар.
+Представление не копирует расписание: фильтр применяется к парам исходной (обычно закэшированной) недели
+в момент обращения. Представления повторяют интерфейс Week, Day и PairsSet, поэтому их можно передавать
+в generate_ics_from_week и say_day вместо исходных объектов. Фильтры объединяются:
+
+    WeekView(week).subgroup(2).pair_type(1).dates(start, end)
+"""
+import datetime
+from abc import ABC, abstractmethod
+from typing import Callable, Iterator
+
+from schedule import Day, Pair, PairsSet, Week
+
+Predicate = Callable[[Pair], bool]
+
+
+def _all_pairs(pair: Pair) -> bool:
+    return True
+
+
+def _both(first: Predicate, second: Predicate) -> Predicate:
+    if first is _all_pairs:
+        return second
+    return lambda pair: first(pair) and second(pair)
+
+
+class _Filterable(ABC):
+    """Методы фильтрации, общие для представлений недели и дня. Каждый возвращает новое представление"""
+    __slots__ = ()
+
+    @abstractmethod
+    def where(self, predicate: Predicate):
+        """Представление с парами, прошедшими и прежние фильтры, и predicate"""
+
+    def subgroup(self, subgroup: int):
+        """Пары подгруппы и пары всей группы (без подгрупп)"""
+        return self.where(lambda pair: not pair.subgroups or subgroup in pair.subgroups)
+
+    def pair_type(self, *pair_types: int):
+        """Пары указанных типов (см. Pair.PAIR_TYPES)"""
+        return self.where(lambda pair: pair.pair_type in pair_types)
+
+    def teacher(self, name: str):
+        """Пары преподавателя, имя сравнивается без учёта регистра и может быть неполным"""
+        name = name.lower()
+        return self.where(lambda pair: pair.teacher is not None and name in pair.teacher.lower())
+
+
+class PairsSetView:
+    """
+    Набор пар, из которого при обращении отбрасываются пары, не прошедшие фильтр.
+    Отобранные пары запоминаются при первом обращении (ссылки на те же объекты Pair).
+    """
+    __slots__ = ('_pairs_set', '_predicate', '_pairs')
+
+    def __init__(self, pairs_set: PairsSet, predicate: Predicate = _all_pairs):
+        self._pairs_set = pairs_set
+        self._predicate = predicate
+        self._pairs = None
+
+    @property
+    def number(self) -> int:
+        return self._pairs_set.number
+
+    @property
+    def pairs_set(self) -> tuple[Pair, ...]:
+        if self._pairs is None:
+            self._pairs = tuple(filter(self._predicate, self._pairs_set.pairs_set))
+        return self._pairs
+
+    def __iter__(self) -> Iterator[Pair]:
+        return iter(self.pairs_set)
+
+    def __len__(self):
+        return len(self.pairs_set)
+
+    def __str__(self):
+        return str(self.freeze())
+
+    def freeze(self) -> PairsSet:
+        return PairsSet(self.number, self.pairs_set)
+
+
+class DayView(_Filterable):
+    """
+    День с отфильтрованными парами. Как и у Day после strip_day,
+    в pairs нет пустых наборов пар в начале и в конце дня.
+    """
+    __slots__ = ('_day', '_predicate', '_pairs')
+
+    def __init__(self, day: Day, predicate: Predicate = _all_pairs):
+        self._day = day
+        self._predicate = predicate
+        self._pairs = None
+
+    def where(self, predicate: Predicate) -> 'DayView':
+        return DayView(self._day, _both(self._predicate, predicate))
+
+    @property
+    def date(self) -> datetime.date:
+        return self._day.date
+
+    @property
+    def pairs(self) -> tuple[PairsSetView, ...]:
+        # Вычисляется при первом обращении, сами пары при этом не копируются
+        if self._pairs is None:
+            pairs = [PairsSetView(pairs_set, self._predicate) for pairs_set in self._day.pairs]
+            non_empty = [i for i, pairs_set in enumerate(pairs) if len(pairs_set)]
+            self._pairs = tuple(pairs[non_empty[0]:non_empty[-1] + 1]) if non_empty else ()
+        return self._pairs
+
+    def __str__(self):
+        return str(self.freeze())
+
+    def freeze(self) -> Day:
+        return Day(self.date, tuple(pairs_set.freeze() for pairs_set in self.pairs))
+
+
+class WeekView(_Filterable):
+    """Неделя с отфильтрованными парами и, возможно, только частью дней"""
+    __slots__ = ('_week', '_predicate', '_start', '_end', '_days')
+
+    def __init__(self, week: Week, predicate: Predicate = _all_pairs,
+                 start: datetime.date = None, end: datetime.date = None):
+        self._week = week
+        self._predicate = predicate
+        self._start = start
+        self._end = end
+        self._days = None
+
+    def where(self, predicate: Predicate) -> 'WeekView':
+        return WeekView(self._week, _both(self._predicate, predicate), self._start, self._end)
+
+    def dates(self, start: datetime.date = None, end: datetime.date = None) -> 'WeekView':
+        """Только дни с start по end включительно, любую из границ можно не указывать"""
+        start = max(filter(None, (start, self._start)), default=None)
+        end = min(filter(None, (end, self._end)), default=None)
+        return WeekView(self._week, self._predicate, start, end)
+
+    @property
+    def number_week(self) -> int:
+        return self._week.number_week
+
+    @property
+    def days(self) -> tuple[DayView, ...]:
+        # Как и DayView.pairs, вычисляется один раз при первом обращении
+        if self._days is None:
+            self._days = tuple(
+                DayView(day, self._predicate) for day in self._week.days
+                if (self._start is None or day.date >= self._start) and (self._end is None or day.date <= self._end)
+            )
+        return self._days
+
+    def __iter__(self) -> Iterator[DayView]:
+        return iter(self.days)
+
+    def __str__(self):
+        return str(self.freeze())
+
+    def freeze(self) -> Week:
+        """Неделя с отфильтрованными парами, например для сохранения в кэш"""
+        return Week(self.number_week, tuple(day.freeze() for day in self.days))